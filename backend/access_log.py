@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import datetime
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import parse_qs
+
+# --- 1. CONFIG ---
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# ACCESS_LOG=off disables the access log; any other value is a file path (default: stdout)
+ACCESS_LOG = os.environ.get("ACCESS_LOG", "stdout")
+
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+# Where a user id can be read from when the client does not send `Authorization: Bearer <id>`
+USER_ID_PARAMS = ("roll_no", "staff_no", "faculty_id", "student_id", "student_roll_no", "posted_by")
+
+access_logger = logging.getLogger("backend.access")
+
+_request_id: ContextVar = ContextVar("request_id", default=None)
+_listener = None
+
+def current_request_id():
+    return _request_id.get()
+
+class _RequestIdFilter(logging.Filter):
+    # Stamps the request id on the record so the console format can print it next to app log lines
+    def filter(self, record):
+        record.request_id = _request_id.get() or "-"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = getattr(record, "access", None)
+        if entry is None:
+            entry = {"level": record.levelname, "logger": record.name, "message": record.getMessage()}
+        ts = datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+        return json.dumps({"ts": ts.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts.microsecond // 1000:03d}Z", **entry})
+
+# --- 2. NON-BLOCKING SETUP ---
+def configure_logging():
+    """
+    Single logging setup for the app (replaces the scattered basicConfig calls).
+    Loggers only put records on a queue; a listener thread formats and writes them,
+    so a slow terminal or disk never stalls the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    # Application records go to the console as before, access records to the JSON handler
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter("%(levelname)s:%(name)s:[%(request_id)s] %(message)s"))
+    console.addFilter(lambda r: r.name != access_logger.name)
+    handlers = [console]
+    if ACCESS_LOG.lower() != "off":
+        access = logging.StreamHandler(sys.stdout) if ACCESS_LOG == "stdout" else logging.FileHandler(ACCESS_LOG)
+        access.setFormatter(JsonFormatter())
+        access.addFilter(lambda r: r.name == access_logger.name)
+        handlers.append(access)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    queue_handler = QueueHandler(log_queue)
+    # The request id has to be captured on the request's thread, before the record is queued
+    queue_handler.addFilter(_RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    access_logger.setLevel(logging.INFO if ACCESS_LOG.lower() != "off" else logging.CRITICAL)
+
+def stop_logging():
+    """Flushes whatever is still queued (called on shutdown / exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# --- 3. ACCESS LOG MIDDLEWARE ---
+def _user_id(scope, headers: dict):
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip() or None
+    path_params = scope.get("path_params") or {}
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1")) if scope.get("query_string") else {}
+    for name in USER_ID_PARAMS:
+        if path_params.get(name):
+            return str(path_params[name])
+        if query.get(name):
+            return query[name][0]
+    return None
+
+class AccessLogMiddleware:
+    """
+    Plain ASGI middleware (outermost): assigns the request id (X-Request-ID from the client
+    or a new one), echoes it on the response and writes one JSON access line per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        status = 500
+        bytes_in = 0
+        bytes_out = 0
+
+        async def receive_wrapper():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, bytes_out
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode())]}
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            stats = scope.get("query_stats")
+            from .metrics import route_label
+            client = scope.get("client")
+            access_logger.info("", extra={"access": {
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_label(scope),
+                "status": status,
+                "duration_ms": round(duration_ms, 2),
+                "db_ms": round(stats.seconds * 1000, 2) if stats else None,
+                "queries": stats.count if stats else None,
+                "app_ms": round(duration_ms - stats.seconds * 1000, 2) if stats else None,
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "user_id": _user_id(scope, headers),
+                "client": client[0] if client else None,
+            }})
+            _request_id.reset(token)
@@ -0,0 +1,217 @@
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- 1. ROUTE CLASSES ---
+# Every limit is per worker. Each value can be overridden with ADMISSION_<CLASS>_<SETTING>, e.g.
+# ADMISSION_IMPORT_CONCURRENCY=1 or ADMISSION_READ_RATE=0 (0 turns that limit off).
+#   concurrency  requests of the class running at once
+#   queue        requests allowed to wait for a slot; beyond that -> 503
+#   wait         seconds a queued request waits for a slot before giving up -> 503
+#   rate, burst  token bucket per client IP: `rate` requests/s, bursts of `burst` -> 429
+DEFAULT_LIMITS = {
+    "import":    {"concurrency": 2,  "queue": 4,   "wait": 15.0, "rate": 0.2, "burst": 3},
+    "upload":    {"concurrency": 4,  "queue": 16,  "wait": 10.0, "rate": 1.0, "burst": 10},
+    "analytics": {"concurrency": 4,  "queue": 32,  "wait": 5.0,  "rate": 5.0, "burst": 20},
+    "read":      {"concurrency": 64, "queue": 256, "wait": 2.0,  "rate": 0,   "burst": 0},
+}
+
+# First match wins. Writes that match nothing (plain JSON forms) are not limited.
+IMPORT_PATHS = re.compile(
+    r"^/(admin/bulk-upload/[^/]+|admin/arrears/preview|admin/upload-arrears|marks/process-excel|marks/bulk-sync-excel)$"
+)
+# Spreadsheet exports scan whole sections or departments, so they share the analytics limits
+ANALYTICS_PATHS = re.compile(r"^/(analytics/|marks/section/export$)")
+# Probes and scrapes must keep answering while the API sheds load
+EXEMPT_PATHS = {"/healthz", "/readyz", "/metrics"}
+# File mounts and thumbnails stream for as long as the client takes to download; holding a
+# "read" slot for that would let a few slow downloads push API reads into 503s
+EXEMPT_PREFIXES = ("/static/", "/uploads/", "/images/")
+WRITE_METHODS = {"POST", "PUT", "PATCH"}
+
+MAX_BUCKETS = 10000
+
+def classify(scope):
+    method, path = scope["method"], scope["path"]
+    if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method in WRITE_METHODS:
+        if IMPORT_PATHS.match(path):
+            return "import"
+        content_type = dict(scope.get("headers") or []).get(b"content-type", b"")
+        return "upload" if content_type.startswith(b"multipart/form-data") else None
+    if method in ("GET", "HEAD"):
+        return "analytics" if ANALYTICS_PATHS.match(path) else "read"
+    return None
+
+def _limits(name: str) -> dict:
+    limits = {}
+    for key, default in DEFAULT_LIMITS[name].items():
+        raw = os.environ.get(f"ADMISSION_{name.upper()}_{key.upper()}")
+        limits[key] = type(default)(raw) if raw else default
+    return limits
+
+# --- 2. LIMITERS ---
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class TokenBuckets:
+    """One token bucket per client; refilled lazily from the elapsed time on each take()."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._buckets = {}  # client -> (tokens, last refill)
+
+    def take(self, client: str):
+        now = time.monotonic()
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            raise Rejected(429, "rate_limited", (1 - tokens) / self.rate)
+        self._buckets[client] = (tokens - 1, now)
+        if len(self._buckets) > MAX_BUCKETS:
+            # Clients idle long enough to have refilled completely carry no state worth keeping
+            full = now - self.burst / self.rate
+            self._buckets = {k: v for k, v in self._buckets.items() if v[1] > full}
+
+class ConcurrencyLimiter:
+    """At most `concurrency` holders; up to `queue` more wait (in arrival order) for `wait` seconds."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, wait: float):
+        self.name = name
+        self.queue = queue
+        self.wait = wait
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _report(self):
+        if metrics.ENABLED:
+            metrics.ADMISSION_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+            metrics.ADMISSION_ACTIVE.labels(self.name).set(self.active)
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue:
+                raise Rejected(503, "queue_full", self.wait)
+            self.waiting += 1
+            self._report()
+            try:
+                await self._wait_for_permit()
+            except asyncio.TimeoutError:
+                raise Rejected(503, "queue_timeout", self.wait)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self._report()
+
+    async def _wait_for_permit(self):
+        """
+        The acquire runs as its own task, shielded from the timeout: cancelling it directly could
+        land just after release() handed it the permit, and that permit would be lost for good.
+        Instead, a permit that arrives as the wait ends is kept (timeout) or given back (client gone).
+        """
+        task = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(task), self.wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if task.done() and not task.cancelled():
+                if isinstance(e, asyncio.TimeoutError):
+                    return
+                self._semaphore.release()
+            else:
+                task.cancel()
+                task.add_done_callback(self._release_if_acquired)
+            raise
+
+    def _release_if_acquired(self, task):
+        # The cancel arrived after the permit did
+        if not task.cancelled() and task.exception() is None:
+            self._semaphore.release()
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+        self._report()
+
+class RouteClass:
+    def __init__(self, name: str):
+        limits = _limits(name)
+        self.name = name
+        self.limiter = (
+            ConcurrencyLimiter(name, limits["concurrency"], limits["queue"], limits["wait"])
+            if limits["concurrency"] > 0 else None
+        )
+        self.buckets = TokenBuckets(limits["rate"], limits["burst"]) if limits["rate"] > 0 else None
+
+ROUTE_CLASSES = {name: RouteClass(name) for name in DEFAULT_LIMITS}
+
+def _client(scope) -> str:
+    # The peer address, never a client-supplied header: bearer tokens are not verified here, so
+    # keying on them would let a client dodge its bucket by sending a new token per request.
+    # Behind a proxy, run uvicorn with --proxy-headers / --forwarded-allow-ips so this is the real client.
+    client = scope.get("client")
+    return client[0] if client else "-"
+
+# --- 3. MIDDLEWARE ---
+class AdmissionMiddleware:
+    """
+    Plain ASGI middleware: applies the class's token bucket, then waits for a concurrency slot.
+    Rejections are answered before the request body is read, with a Retry-After header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = classify(scope) if scope["type"] == "http" else None
+        route_class = ROUTE_CLASSES.get(name)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = route_class.limiter
+        try:
+            if route_class.buckets is not None:
+                route_class.buckets.take(_client(scope))
+            if limiter is not None:
+                await limiter.acquire()
+        except Rejected as e:
+            await self._reject(scope, send, name, e)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    async def _reject(self, scope, send, name: str, rejection: Rejected):
+        if metrics.ENABLED:
+            metrics.ADMISSION_REJECTED.labels(name, rejection.reason).inc()
+        logger.warning(f"{scope['method']} {scope['path']} rejected ({name}: {rejection.reason})")
+        detail = "Too many requests, slow down" if rejection.status_code == 429 else "Server busy, try again shortly"
+        body = f'{{"detail": "{detail}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejection.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
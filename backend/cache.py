@@ -0,0 +1,90 @@
+import time
+import threading
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+# --- IN-PROCESS TTL CACHE ---
+# Each uvicorn worker keeps its own copy; entries expire on their own and writers
+# invalidate the keys they touch, so a stale read is bounded by the TTL at worst.
+class TTLCache:
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 1024):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                # Drop the entry closest to expiry to make room
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, match=None):
+        """Removes every entry, or only those whose key satisfies `match(key)`."""
+        with self._lock:
+            if match is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if match(k)]:
+                    del self._data[key]
+
+# Announcements and course materials for a section, shared by every student dashboard in it.
+# Cleared whenever an announcement or material is posted or deleted.
+section_feed_cache = TTLCache(ttl_seconds=60)
+
+# Statistical summaries per (course_code, section) for /analytics/course.
+# A worker-local TTL alone would let other workers serve summaries from before a write, so each
+# (course_code, section) also has a version row in the DB: a mark or enrollment write bumps the
+# versions of the classes it touches in its own transaction, and each read checks its class's
+# version (one primary-key lookup). The TTL only bounds memory.
+course_analytics_cache = TTLCache(ttl_seconds=600)
+
+def _analytics_key(course_code: str, section: str) -> tuple:
+    return ((course_code or "").upper().strip(), section)
+
+def _version_name(key: tuple) -> str:
+    return f"course_analytics:{key[0]}:{key[1]}"
+
+def course_analytics_version(db: Session, course_code: str, section: str) -> int:
+    row = db.get(models.CacheVersion, _version_name(_analytics_key(course_code, section)))
+    return row.version if row else 0
+
+def _bump(db: Session, name: str):
+    version = models.CacheVersion
+    bump = update(version).where(version.name == name).values(version=version.version + 1)
+    if db.execute(bump).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.CacheVersion(name=name, version=1))
+    except IntegrityError:
+        # Another writer created the row first
+        db.execute(bump)
+
+def invalidate_course_analytics(db: Session, classes):
+    """
+    Call in the same transaction as any write to marks or enrollments; the caller commits.
+    `classes` are the (course_code, section) pairs the write touched: summaries any worker
+    cached for them before the commit are never served again; other classes keep theirs.
+    """
+    keys = {_analytics_key(code, section) for code, section in classes}
+    for key in sorted(keys):
+        _bump(db, _version_name(key))
+    course_analytics_cache.invalidate(lambda cached: cached[:2] in keys)
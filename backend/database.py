@@ -22,6 +22,10 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 🌟 3. Opt-in slow query log (SLOW_QUERY_MS=<threshold>), with EXPLAIN plans
+from .slow_queries import instrument_engine as instrument_slow_queries
+instrument_slow_queries(engine)
+
 # --- 3. SESSION FACTORY ---
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
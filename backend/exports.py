@@ -0,0 +1,82 @@
+import io
+import csv
+import tempfile
+
+# --- STREAMING SPREADSHEET EXPORTS ---
+# Rows are pulled from the DB in batches of YIELD_PER (server-side cursor via Query.yield_per) and
+# written out as they arrive, so a department-wide export never holds all of its rows in memory.
+YIELD_PER = 1000
+FLUSH_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# (header, row attribute) for _section_marks_query rows; totals are the stored computed columns
+MARK_EXPORT_COLUMNS = [
+    ("Roll No", "student_roll_no"),
+    ("Name", "name"),
+    ("Course Code", "course_code"),
+    ("Section", "section"),
+    ("CIA 1", "cia1_marks"),
+    ("CIA 1 Retest", "cia1_retest"),
+    ("CIA 1 (Effective)", "cia1_effective"),
+    ("IA 1", "ia1_marks"),
+    ("CIA 2", "cia2_marks"),
+    ("CIA 2 Retest", "cia2_retest"),
+    ("CIA 2 (Effective)", "cia2_effective"),
+    ("IA 2", "ia2_marks"),
+    ("CIA Total", "cia_total"),
+    ("Attendance %", "subject_attendance"),
+]
+TEXT_COLUMNS = {"student_roll_no", "name", "course_code", "section"}
+
+def _values(row) -> list:
+    return [
+        getattr(row, attr) if attr in TEXT_COLUMNS else (getattr(row, attr) or 0)
+        for _, attr in MARK_EXPORT_COLUMNS
+    ]
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _ in MARK_EXPORT_COLUMNS])
+    for row in rows:
+        writer.writerow(_values(row))
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def _xlsx_chunks(rows):
+    """
+    A write-only workbook streams rows into its temp files instead of building cells in memory.
+    The zip container can only be written once the sheet is complete, so the finished file is
+    spooled to disk and then sent in chunks.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Marks")
+    sheet.append([header for header, _ in MARK_EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append(_values(row))
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(FLUSH_BYTES):
+            yield chunk
+
+def stream_marks(db, query, format: str):
+    """Generator for StreamingResponse; owns `db` and closes it when the download ends or is aborted."""
+    try:
+        rows = query.yield_per(YIELD_PER)
+        chunks = _xlsx_chunks(rows) if format == "xlsx" else _csv_chunks(rows)
+        yield from chunks
+    finally:
+        db.close()
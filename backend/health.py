@@ -0,0 +1,88 @@
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from sqlalchemy import text, create_engine
+from sqlalchemy.pool import NullPool
+
+from . import storage
+from .database import engine
+
+# --- 1. CONFIG ---
+READY_DB_TIMEOUT = float(os.environ.get("READY_DB_TIMEOUT", "2"))
+READY_MIN_FREE_MB = int(os.environ.get("READY_MIN_FREE_MB", "100"))
+# Not ready once this share of the pool (size + overflow) is checked out
+READY_MAX_POOL_SATURATION = float(os.environ.get("READY_MAX_POOL_SATURATION", "1.0"))
+WRITABLE_DIRS = ["uploads", storage.UPLOAD_DIR]
+
+# The DB probe runs here so a hung connection only costs the probe its timeout, not a request thread.
+# Two workers: one stuck probe does not block the next one from reporting.
+_probe_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="readiness-probe")
+
+# Probes open their own unpooled connection: the short lock timeout must not leak into the
+# connections that serve requests, and a probe must not wait behind an exhausted request pool
+_probe_engine = create_engine(
+    engine.url,
+    poolclass=NullPool,
+    # sqlite3's `timeout` is the busy timeout: fail fast on a locked database file instead of waiting 5 s
+    connect_args={"timeout": READY_DB_TIMEOUT, "check_same_thread": False} if engine.url.get_backend_name() == "sqlite" else {},
+)
+
+# --- 2. CHECKS ---
+def _query_db():
+    with _probe_engine.connect() as conn:
+        # sqlite_master needs a shared lock, so this also fails while another process holds the file exclusively
+        conn.execute(text("SELECT count(*) FROM sqlite_master" if conn.dialect.name == "sqlite" else "SELECT 1"))
+
+def check_database() -> dict:
+    started = time.perf_counter()
+    try:
+        _probe_pool.submit(_query_db).result(timeout=READY_DB_TIMEOUT)
+        ok, error = True, None
+    except FutureTimeout:
+        ok, error = False, f"no answer within {READY_DB_TIMEOUT:g}s"
+    except Exception as e:
+        ok, error = False, str(e)
+    return {"ok": ok, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+
+def check_directory(path: str) -> dict:
+    """Writable (a temp file can be created and removed) and above READY_MIN_FREE_MB free space."""
+    try:
+        os.makedirs(path, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path, prefix=".readyz-"):
+            pass
+        free_mb = shutil.disk_usage(path).free // (1024 * 1024)
+    except OSError as e:
+        return {"ok": False, "path": path, "error": str(e)}
+    ok = free_mb >= READY_MIN_FREE_MB
+    return {
+        "ok": ok, "path": path, "free_mb": free_mb,
+        "error": None if ok else f"free space below {READY_MIN_FREE_MB} MB",
+    }
+
+def check_pool() -> dict:
+    pool = engine.pool
+    size = pool.size() if callable(getattr(pool, "size", None)) else None
+    if size is None:
+        # Pools without a fixed size (NullPool, StaticPool) cannot saturate
+        return {"ok": True, "class": type(pool).__name__}
+    checked_out = pool.checkedout()
+    capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+    saturation = checked_out / capacity if capacity else 0.0
+    ok = saturation < READY_MAX_POOL_SATURATION
+    return {
+        "ok": ok, "class": type(pool).__name__, "size": size, "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0), "capacity": capacity, "saturation": round(saturation, 2),
+        "error": None if ok else "connection pool exhausted",
+    }
+
+def readiness() -> tuple:
+    """(ready?, per-check details) for /readyz."""
+    checks = {
+        "database": check_database(),
+        "pool": check_pool(),
+        "disk": [check_directory(path) for path in WRITABLE_DIRS],
+    }
+    ready = checks["database"]["ok"] and checks["pool"]["ok"] and all(d["ok"] for d in checks["disk"])
+    return ready, checks
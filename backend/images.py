@@ -0,0 +1,90 @@
+import os
+import logging
+import mimetypes
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+# Pillow is needed to build thumbnails; without it the original image is served for every size
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# --- 1. DERIVATIVE SIZES ---
+# Longest edge in pixels; images are scaled down to fit, never up
+SIZES = {
+    "thumb": 160,   # marquee logos, avatars
+    "small": 400,   # placement wall cards
+    "medium": 800,  # profile modal / detail view
+}
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+DERIVED_DIR = "uploaded_files/derived"
+IMAGES_URL = "http://localhost:8000/images"
+
+# Thumbnails are built off the request path so uploads return immediately
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-derivatives")
+
+def is_image(path: str) -> bool:
+    return (mimetypes.guess_type(path)[0] or "").startswith("image/") and not path.endswith(".svg")
+
+def derivative_path(sha256: str, size: str, fmt: str) -> str:
+    return f"{DERIVED_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}/{size}.{fmt}"
+
+def derivative_urls(link: Optional[str]) -> dict:
+    """Size-selectable URLs for a content-addressed image link; empty for legacy or non-image links."""
+    if not link or "/blobs/" not in link or not is_image(link):
+        return {}
+    sha256 = os.path.splitext(os.path.basename(link))[0]
+    return {size: f"{IMAGES_URL}/{sha256}/{size}.webp" for size in SIZES}
+
+# --- 2. GENERATION ---
+def make_derivative(source_path: str, sha256: str, size: str, fmt: str = "webp") -> Optional[str]:
+    """Builds one derivative on disk (if it is not there yet) and returns its path; None if it cannot be built."""
+    dest = derivative_path(sha256, size, fmt)
+    if os.path.exists(dest):
+        return dest
+    if Image is None:
+        return None
+
+    max_px = SIZES[size]
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    with Image.open(source_path) as im:
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((max_px, max_px), Image.LANCZOS)
+        if fmt == "jpg":
+            if im.mode != "RGB":
+                im = im.convert("RGB")
+            im.save(tmp_path, "JPEG", quality=82, optimize=True, progressive=True)
+        else:
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA")
+            im.save(tmp_path, "WEBP", quality=80, method=4)
+    os.replace(tmp_path, dest)
+    return dest
+
+def _build_all(source_path: str, sha256: str):
+    for size in SIZES:
+        try:
+            make_derivative(source_path, sha256, size, "webp")
+        except Exception as e:
+            logger.warning(f"Thumbnail {size} failed for {source_path}: {e}")
+            return
+
+def schedule_derivatives(source_path: str, sha256: str):
+    """Queues WebP thumbnails for a newly stored image on the worker pool."""
+    if Image is None or not is_image(source_path):
+        return
+    _pool.submit(_build_all, source_path, sha256)
+
+def remove_derivatives(sha256: str):
+    folder = os.path.dirname(derivative_path(sha256, "thumb", "webp"))
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder, name))
+    os.rmdir(folder)
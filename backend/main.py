@@ -1,36 +1,38 @@
 import os
 import shutil
 import time
+import datetime
 import csv
 import io
 import logging
 import traceback
 import pandas as pd
 from io import BytesIO
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Response, Query
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, insert, update, inspect, tuple_, select, exists, func, literal, and_
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 from pydantic import BaseModel
 
 # --- 1. SETUP & IMPORTS ---
-from . import models, schemas
+from . import models, schemas, storage, images, ranks, metrics, query_stats, profiling, access_log, admission, exports
+from .cache import section_feed_cache, invalidate_course_analytics
 from .database import SessionLocal, engine, get_db
-from .routers import placements, advisors
+from .static_files import CachedStaticFiles, serve_file
+from .routers import placements, advisors, media, analytics, monitoring
 
 # Create base directories immediately to prevent "Directory does not exist" errors
-UPLOAD_DIR = "uploaded_files"
-ADVISOR_DIR = "uploads/advisor_docs"
+UPLOAD_DIR = storage.UPLOAD_DIR
+ADVISOR_DIR = storage.ADVISOR_DIR
 
 for folder in [UPLOAD_DIR, "uploads", ADVISOR_DIR]:
     if not os.path.exists(folder):
         os.makedirs(folder, exist_ok=True)
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (one place for the whole app: queued handlers plus the JSON access log)
+access_log.configure_logging()
 logger = logging.getLogger(__name__)
 
 # Create database tables automatically
@@ -71,19 +73,122 @@ def ensure_profile_columns():
     except Exception as e:
         logger.error(f"Migration/Cleanup failed: {e}")
 
+def ensure_arrear_unique_key():
+    """Removes duplicate arrear rows left by older uploads and adds the (roll_no, subject_code, semester) unique index."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(
+                "DELETE FROM arrears WHERE id NOT IN "
+                "(SELECT MIN(id) FROM arrears GROUP BY roll_no, subject_code, semester)"
+            ))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_arrears_roll_subject_sem "
+                "ON arrears (roll_no, subject_code, semester)"
+            ))
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Arrear unique key migration failed: {e}")
+
+def ensure_import_batch_columns():
+    """Adds the import_batch_id provenance column (and its index) to tables created before bulk imports were tracked."""
+    try:
+        inspector = inspect(engine)
+        with engine.connect() as conn:
+            for table in ["users", "faculties", "students", "academic_data", "arrears"]:
+                cols = [c["name"] for c in inspector.get_columns(table)]
+                if "import_batch_id" not in cols:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN import_batch_id INTEGER"))
+                    logger.info(f"Added 'import_batch_id' column to {table} table.")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_import_batch_id ON {table} (import_batch_id)"))
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Import batch migration failed: {e}")
+
+def ensure_arrear_import_rows():
+    """Seeds arrear import membership from import_batch_id for arrears imported before it was tracked."""
+    try:
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM arrear_import_rows LIMIT 1")).first() is None:
+                conn.execute(text(
+                    "INSERT INTO arrear_import_rows (batch_id, arrear_id) "
+                    "SELECT import_batch_id, id FROM arrears WHERE import_batch_id IS NOT NULL"
+                ))
+                conn.commit()
+    except Exception as e:
+        logger.error(f"Arrear import membership migration failed: {e}")
+
+def ensure_cia_total_columns():
+    """Adds the stored effective-CIA / total columns and fills them once for existing marks."""
+    try:
+        cols = [c["name"] for c in inspect(engine).get_columns("academic_data")]
+        added = False
+        with engine.connect() as conn:
+            for col in ["cia1_effective", "cia2_effective", "cia_total"]:
+                if col not in cols:
+                    conn.execute(text(f"ALTER TABLE academic_data ADD COLUMN {col} FLOAT DEFAULT 0"))
+                    logger.info(f"Added '{col}' column to academic_data table.")
+                    added = True
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_academic_data_course_section_total "
+                "ON academic_data (course_code, section, cia_total)"
+            ))
+            conn.commit()
+        if added:
+            with SessionLocal() as db:
+                db.query(models.AcademicData).update(models.CIA_TOTAL_VALUES, synchronize_session=False)
+                db.commit()
+            logger.info("Backfilled stored CIA totals.")
+    except Exception as e:
+        logger.error(f"CIA total migration failed: {e}")
+
+def ensure_enrollment_unique_key():
+    """Removes duplicate enrollments and adds the (student_roll_no, course_id) unique index."""
+    try:
+        with engine.connect() as conn:
+            # Keep the oldest row: it is the one /marks/sync has been writing to
+            conn.execute(text(
+                "DELETE FROM academic_data WHERE course_id IS NOT NULL AND id NOT IN "
+                "(SELECT MIN(id) FROM academic_data WHERE course_id IS NOT NULL GROUP BY student_roll_no, course_id)"
+            ))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_academic_data_student_course "
+                "ON academic_data (student_roll_no, course_id)"
+            ))
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Enrollment unique key migration failed: {e}")
+
 # Run migration check on startup
 ensure_profile_columns()
+ensure_arrear_unique_key()
+ensure_import_batch_columns()
+ensure_arrear_import_rows()
+ensure_cia_total_columns()
+ensure_enrollment_unique_key()
+
+# Register files saved before the uploads table existed (already registered files are skipped)
+try:
+    with SessionLocal() as _db:
+        storage.backfill_upload_registry(_db)
+        ranks.ensure_ranks(_db)
+except Exception as e:
+    logger.error(f"Upload registry backfill failed: {e}")
 
 # --- 2. INITIALIZE THE APP ---
 app = FastAPI(title="College Management System API")
 
 # --- MIDDLEWARE & SECURITY ---
+# Concurrency / rate limits per route class (added first so it sits inside CORS: 429/503s stay readable
+# by the browser, and a rejected upload is answered before its body is read)
+app.add_middleware(admission.AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-DB-Query-Count", "X-DB-Time-Ms", "X-Profile-Id", "X-Request-ID", "Retry-After"],
 )
 
 # Global Exception Handler to catch 500 errors and print them to terminal
@@ -99,14 +204,38 @@ async def catch_exceptions_middleware(request: Request, call_next):
             content={"detail": f"Internal Server Error: {str(exc)}", "trace": traceback.format_summary(traceback.extract_tb(exc.__traceback__))[0]}
         )
 
+# On-demand request profiling; only installed when PROFILE_TOKEN is set
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Per-request SQL statement count / DB time (debug headers, N+1 budget warning)
+app.add_middleware(query_stats.QueryStatsMiddleware)
+query_stats.instrument_engine(engine)
+
+# Request metrics for /metrics (outside the exception handler, so error responses are counted too)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+# JSON access log + request id (outermost: sees the final status, total time and DB stats)
+app.add_middleware(access_log.AccessLogMiddleware)
+
+@app.on_event("shutdown")
+def release_worker_metrics():
+    metrics.mark_worker_dead()
+    access_log.stop_logging()
+
 # --- MOUNT STATIC FILES ---
 # Mounting /uploads for Advisor Docs and /static for General Uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
+# (ETags, Cache-Control, byte ranges and precompressed variants come from CachedStaticFiles)
+app.mount("/uploads", CachedStaticFiles(directory="uploads"), name="uploads")
+app.mount("/static", CachedStaticFiles(directory=UPLOAD_DIR), name="static")
 
 # --- INCLUDE ROUTERS ---
 app.include_router(placements.router)
 app.include_router(advisors.router)
+app.include_router(media.router)
+app.include_router(analytics.router)
+app.include_router(monitoring.router)
 
 # --- PYDANTIC MODELS ---
 class MarkSyncRequest(BaseModel):
@@ -146,6 +275,12 @@ class AdminEnrollmentRequest(BaseModel):
     course_code: str
     section: Optional[str] = "A"
 
+class PromotionRequest(BaseModel):
+    year: int
+    section: str
+    semester: int # Source semester: only students still in it move up, so a repeated call promotes no one twice
+    dry_run: bool = False
+
 # --- AUTHENTICATION ---
 @app.post("/login", response_model=schemas.Token)
 def login(login_data: schemas.LoginData, db: Session = Depends(get_db)):
@@ -230,21 +365,7 @@ def admin_create_user(data: AdminUserCreateRequest, db: Session = Depends(get_db
             db.add(profile)
             db.flush()
 
-            courses = db.query(models.Course).filter(
-                models.Course.semester == data.semester,
-                models.Course.section == data.section
-            ).all()
-            
-            for course in courses:
-                enrollment = models.AcademicData(
-                    student_roll_no=data.id, 
-                    course_id=course.id, 
-                    course_code=course.code.upper().strip(), 
-                    subject=course.title,
-                    section=data.section,
-                    status="Pursuing"
-                )
-                db.add(enrollment)
+            _enroll_matching(db, models.Student.roll_no == data.id)
 
         elif data.role == "Faculty":
             profile = models.Faculty(
@@ -255,6 +376,8 @@ def admin_create_user(data: AdminUserCreateRequest, db: Session = Depends(get_db
             )
             db.add(profile)
         
+        if data.role == "Student":
+            ranks.mark_stale(db)
         db.commit()
         return {"message": f"{data.role} created and enrolled successfully"}
     except Exception as e:
@@ -263,7 +386,12 @@ def admin_create_user(data: AdminUserCreateRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/bulk-upload/{role}")
-async def bulk_upload_users(role: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def bulk_upload_users(
+    role: str,
+    file: UploadFile = File(...),
+    uploaded_by: Optional[str] = Form("Admin"),
+    db: Session = Depends(get_db)
+):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
@@ -274,69 +402,67 @@ async def bulk_upload_users(role: str, file: UploadFile = File(...), db: Session
     timestamp = int(time.time())
     safe_filename = file.filename.replace(" ", "_")
     saved_filename = f"bulk_{timestamp}_{role}_{safe_filename}"
-    file_path = os.path.join(UPLOAD_DIR, saved_filename)
-    
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(decoded)
+    upload = storage.save_upload(
+        db, contents, saved_filename, "bulk_csv",
+        original_name=file.filename, role=role, uploaded_by=uploaded_by
+    )
+    saved_filename = upload.filename
     # ----------------------------------------------------
 
+    # Every row created from this file is tagged with the batch so it can be undone in one go
+    batch = models.ImportBatch(kind="users", role=role, filename=saved_filename, original_name=file.filename)
+    db.add(batch)
+    db.flush()
+
     reader = csv.DictReader(io.StringIO(decoded))
     success_count = 0
     errors = []
 
-    for row in reader:
+    # Line numbers as a spreadsheet shows them (the header is line 1)
+    for line_no, row in enumerate(reader, start=2):
+        uid = row.get('id') or row.get('roll_no') or row.get('staff_no')
+        if not uid: continue
+        uid = str(uid).strip()
         try:
-            uid = row.get('id') or row.get('roll_no') or row.get('staff_no')
-            if not uid: continue
-            uid = str(uid).strip()
-
             if db.query(models.User).filter(models.User.id == uid).first():
-                errors.append(f"ID {uid} already exists")
+                errors.append(f"ID {uid} already exists (line {line_no})")
                 continue
 
-            new_user = models.User(id=uid, role=role, password=row.get('password', '123456'))
-            db.add(new_user)
-            db.flush()
-
-            if role == "Student":
-                profile = models.Student(
-                    roll_no=uid,
-                    name=row.get('name'),
-                    year=int(row.get('year', 1)),
-                    semester=int(row.get('semester', 1)),
-                    section=row.get('section', 'A'),
-                    cgpa=float(row.get('cgpa', 0.0))
-                )
-                db.add(profile)
-                db.flush()
-
-                courses = db.query(models.Course).filter(
-                    models.Course.semester == profile.semester,
-                    models.Course.section == profile.section
-                ).all()
-                for c in courses:
-                    db.add(models.AcademicData(
-                        student_roll_no=uid, 
-                        course_id=c.id, 
-                        course_code=c.code.upper().strip(), 
-                        subject=c.title, 
-                        section=c.section,
-                        status="Pursuing"
+            # One savepoint per row: its flush happens here, so a bad row (duplicate ID in the file,
+            # constraint violation, unparsable number) is rolled back and reported on its own line
+            # while the rest of the file still goes in
+            with db.begin_nested():
+                db.add(models.User(id=uid, role=role, password=row.get('password', '123456'), import_batch_id=batch.id))
+
+                if role == "Student":
+                    db.add(models.Student(
+                        roll_no=uid,
+                        name=row.get('name'),
+                        year=int(row.get('year', 1)),
+                        semester=int(row.get('semester', 1)),
+                        section=row.get('section', 'A'),
+                        cgpa=float(row.get('cgpa', 0.0)),
+                        import_batch_id=batch.id
                     ))
 
-            elif role == "Faculty":
-                profile = models.Faculty(
-                    staff_no=uid,
-                    name=row.get('name'),
-                    designation=row.get('designation', 'Assistant Professor'),
-                    doj=row.get('doj', '01.01.2026')
-                )
-                db.add(profile)
+                elif role == "Faculty":
+                    db.add(models.Faculty(
+                        staff_no=uid,
+                        name=row.get('name'),
+                        designation=row.get('designation', 'Assistant Professor'),
+                        doj=row.get('doj', '01.01.2026'),
+                        import_batch_id=batch.id
+                    ))
 
             success_count += 1
         except Exception as e:
-            errors.append(f"Error at row {uid if 'uid' in locals() else 'unknown'}: {str(e)}")
+            errors.append(f"Error at line {line_no} (ID {uid}): {getattr(e, 'orig', None) or e}")
 
+    batch.row_count = success_count
+    if role == "Student":
+        # Enroll the whole batch in its semester/section courses with one statement
+        _enroll_matching(db, models.Student.import_batch_id == batch.id, batch_id=batch.id)
+        ranks.mark_stale(db)
     db.commit()
     return {
         "message": f"Successfully uploaded {success_count} users", 
@@ -344,67 +470,126 @@ async def bulk_upload_users(role: str, file: UploadFile = File(...), db: Session
         "file_id": saved_filename # Matches the frontend expectation
     }
 
+def _list_uploads(db: Session, kind: str, response: Response, limit: int, offset: int):
+    """Newest-first page of the upload registry for one kind; total count goes in X-Total-Count."""
+    query = db.query(models.UploadedFile).filter(models.UploadedFile.kind == kind)
+    response.headers["X-Total-Count"] = str(query.count())
+    rows = query.order_by(models.UploadedFile.created_at.desc()).offset(offset).limit(limit).all()
+    return [{
+        "filename": f.filename,
+        "role": f.role,
+        "uploaded_at": int(f.created_at.replace(tzinfo=datetime.timezone.utc).timestamp()),
+        "original_name": f.original_name,
+        "size_bytes": f.size_bytes,
+        "uploaded_by": f.uploaded_by
+    } for f in rows]
+
 # 🌟 NEW ENDPOINT: Fetches all uploaded CSV files for the Admin Panel UI
 @app.get("/admin/bulk-upload/files")
-def get_uploaded_csv_files():
-    files_list = []
-    if not os.path.exists(UPLOAD_DIR):
-        return files_list
-        
-    for filename in os.listdir(UPLOAD_DIR):
-        if filename.startswith("bulk_") and filename.endswith(".csv"):
-            # Parse filename format: bulk_{timestamp}_{role}_{original_name}
-            parts = filename.split("_", 3)
-            if len(parts) >= 4:
-                try:
-                    uploaded_at = int(parts[1])
-                    role = parts[2]
-                    files_list.append({
-                        "filename": filename,
-                        "role": role,
-                        "uploaded_at": uploaded_at
-                    })
-                except ValueError:
-                    continue
-                    
-    # Sort by newest first
-    files_list.sort(key=lambda x: x["uploaded_at"], reverse=True)
-    return files_list
+def get_uploaded_csv_files(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    return _list_uploads(db, "bulk_csv", response, limit, offset)
+
+def _enrolled_classes(db: Session, *criteria):
+    """Distinct (course_code, section) of the enrollments matching `criteria`, for analytics invalidation."""
+    return db.query(models.AcademicData.course_code, models.AcademicData.section).filter(*criteria).distinct().all()
+
+def _delete_users(db: Session, user_ids):
+    """Set-based delete of users and everything hanging off them. `user_ids` may be a list or a subquery."""
+    classes = _enrolled_classes(db, models.AcademicData.student_roll_no.in_(user_ids))
+    db.query(models.AcademicData).filter(models.AcademicData.student_roll_no.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.StudentRank).filter(models.StudentRank.roll_no.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.Student).filter(models.Student.roll_no.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.Course).filter(models.Course.faculty_id.in_(user_ids)).update({"faculty_id": None}, synchronize_session=False)
+    db.query(models.Faculty).filter(models.Faculty.staff_no.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.User).filter(models.User.id.in_(user_ids)).delete(synchronize_session=False)
+    ranks.mark_stale(db)
+    invalidate_course_analytics(db, classes)
 
 # 🌟 NEW ENDPOINT: Deletes the CSV file AND all users inside it
 @app.delete("/admin/bulk-upload/file/{filename}")
 def delete_bulk_csv(filename: str, db: Session = Depends(get_db)):
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    if not os.path.exists(file_path):
+    upload = storage.find_upload(db, filename, "bulk_csv")
+    batch = db.query(models.ImportBatch).filter(
+        models.ImportBatch.kind == "users",
+        models.ImportBatch.filename == filename
+    ).first()
+
+    if not batch and not (upload and os.path.exists(upload.path)):
         raise HTTPException(status_code=404, detail="CSV file not found on server")
         
     try:
-        # 1. Read the file to find out WHICH users to delete
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                uid = row.get('id') or row.get('roll_no') or row.get('staff_no')
-                if uid:
-                    uid = str(uid).strip()
-                    # Delete associated data
-                    db.query(models.AcademicData).filter(models.AcademicData.student_roll_no == uid).delete(synchronize_session=False)
-                    db.query(models.Student).filter(models.Student.roll_no == uid).delete(synchronize_session=False)
-                    db.query(models.Course).filter(models.Course.faculty_id == uid).update({"faculty_id": None}, synchronize_session=False)
-                    db.query(models.Faculty).filter(models.Faculty.staff_no == uid).delete(synchronize_session=False)
-                    db.query(models.User).filter(models.User.id == uid).delete(synchronize_session=False)
+        if batch:
+            # 1. Undo the import by batch id; no need to re-read the file
+            batch_users = db.query(models.User.id).filter(models.User.import_batch_id == batch.id).scalar_subquery()
+            _delete_users(db, batch_users)
+            db.delete(batch)
+        else:
+            # 1. Legacy upload made before batches were recorded: read the IDs from the file
+            with open(upload.path, "r", encoding="utf-8") as f:
+                uids = [
+                    str(row.get('id') or row.get('roll_no') or row.get('staff_no')).strip()
+                    for row in csv.DictReader(f)
+                    if row.get('id') or row.get('roll_no') or row.get('staff_no')
+                ]
+            if uids:
+                _delete_users(db, uids)
         
+        # 2. Drop the stored file (the blob is removed once nothing else references it)
+        if upload:
+            storage.release_upload(db, record=upload)
         db.commit()
         
-        # 2. Delete the physical file from the server
-        os.remove(file_path)
-        
         return {"message": "File and associated users deleted successfully"}
     except Exception as e:
         db.rollback()
         logger.error(f"Error undoing CSV upload: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _enroll_matching(db: Session, *criteria, batch_id: Optional[int] = None) -> int:
+    """
+    Enrolls students in the courses of their semester and section as a single INSERT ... SELECT.
+    `criteria` narrow the Student x Course pairs (e.g. one course, one student, one batch).
+    Existing enrollments are skipped, so running it twice adds nothing. Returns rows inserted.
+    """
+    already_enrolled = exists().where(
+        models.AcademicData.student_roll_no == models.Student.roll_no,
+        models.AcademicData.course_id == models.Course.id
+    )
+    pairs = select(
+        models.Student.roll_no,
+        models.Course.id,
+        func.upper(func.trim(models.Course.code)),
+        models.Course.title,
+        models.Course.section,
+        literal("Pursuing"),
+        literal(batch_id, models.AcademicData.import_batch_id.type),
+    ).join(
+        models.Course, and_(
+            models.Course.semester == models.Student.semester,
+            models.Course.section == models.Student.section
+        )
+    ).where(*criteria, ~already_enrolled)
+
+    result = db.execute(insert(models.AcademicData).from_select(
+        ["student_roll_no", "course_id", "course_code", "subject", "section", "status", "import_batch_id"],
+        pairs
+    ))
+    if result.rowcount:
+        # The classes of every matching pair, enrolled now or before: a cheap superset of those that changed
+        classes = db.query(func.upper(func.trim(models.Course.code)), models.Course.section).join(
+            models.Student, and_(
+                models.Course.semester == models.Student.semester,
+                models.Course.section == models.Student.section
+            )
+        ).filter(*criteria).distinct().all()
+        invalidate_course_analytics(db, classes)
+    return result.rowcount
+
 @app.post("/admin/courses")
 def add_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
     existing = db.query(models.Course).filter(
@@ -418,26 +603,12 @@ def add_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
     db_course = models.Course(**course.dict())
     db_course.code = db_course.code.upper().strip()
     db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
-
-    existing_students = db.query(models.Student).filter(
-        models.Student.semester == course.semester,
-        models.Student.section == course.section
-    ).all()
+    db.flush()
 
-    for student in existing_students:
-        enrollment = models.AcademicData(
-            student_roll_no=student.roll_no,
-            course_id=db_course.id,
-            course_code=db_course.code,
-            subject=db_course.title,
-            section=db_course.section,
-            status="Pursuing"
-        )
-        db.add(enrollment)
-    
+    # Enroll the matching cohort in one INSERT ... SELECT
+    _enroll_matching(db, models.Course.id == db_course.id)
     db.commit()
+    db.refresh(db_course)
     return db_course
 
 @app.delete("/admin/courses/{course_id}")
@@ -448,6 +619,7 @@ def delete_course(course_id: int, db: Session = Depends(get_db)):
     
     db.query(models.AcademicData).filter(models.AcademicData.course_id == course.id).delete()
     db.delete(course)
+    invalidate_course_analytics(db, [(course.code, course.section)])
     db.commit()
     return {"message": "Course removed"}
 
@@ -475,13 +647,110 @@ def enroll_student(data: AdminEnrollmentRequest, db: Session = Depends(get_db)):
             status="Pursuing"
         )
         db.add(enrollment)
+        invalidate_course_analytics(db, [(enrollment.course_code, enrollment.section)])
         db.commit()
         return {"message": "Student enrolled successfully"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- END-OF-TERM PROMOTION ---
+FINAL_SEMESTER = 8
+
+@app.post("/admin/promote")
+def promote_cohort(data: PromotionRequest, db: Session = Depends(get_db)):
+    """
+    Advances a year/section from `semester` to the next one in one transaction:
+    current enrollments become Completed, semester/year move up, and the cohort is
+    enrolled in next semester's courses. Students already past `semester` are left
+    alone, so repeating the call is harmless. With dry_run nothing is written.
+    """
+    cohort = db.query(models.Student.roll_no).filter(
+        models.Student.year == data.year,
+        models.Student.section == data.section,
+        models.Student.semester == data.semester
+    )
+    all_rolls = [r for (r,) in cohort.all()]
+    if not all_rolls:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No students in semester {data.semester} for this year and section (already promoted?)"
+        )
+
+    # Final-semester students are left alone (they graduate rather than move up)
+    rolls = [r for (r,) in cohort.filter(models.Student.semester < FINAL_SEMESTER).all()]
+    graduating = len(all_rolls) - len(rolls)
+
+    pursuing = db.query(models.AcademicData).filter(
+        models.AcademicData.student_roll_no.in_(rolls),
+        models.AcademicData.status == "Pursuing"
+    )
+    next_courses = db.query(models.Course.semester, models.Course.code).join(
+        models.Student, and_(
+            models.Course.semester == models.Student.semester + 1,
+            models.Course.section == models.Student.section
+        )
+    ).filter(models.Student.roll_no.in_(rolls)).distinct().order_by(models.Course.semester, models.Course.code).all()
+
+    report = {
+        "year": data.year,
+        "section": data.section,
+        "dry_run": data.dry_run,
+        "students": len(all_rolls),
+        "promoted": len(rolls),
+        "graduating": graduating,
+        "enrollments_completed": pursuing.count(),
+        "next_courses": [code for _, code in next_courses],
+    }
+    if data.dry_run:
+        report["enrollments_created"] = db.query(func.count()).select_from(models.Student).join(
+            models.Course, and_(
+                models.Course.semester == models.Student.semester + 1,
+                models.Course.section == models.Student.section
+            )
+        ).filter(
+            models.Student.roll_no.in_(rolls),
+            ~exists().where(
+                models.AcademicData.student_roll_no == models.Student.roll_no,
+                models.AcademicData.course_id == models.Course.id
+            )
+        ).scalar()
+        return report
+
+    try:
+        # Semesters 1-2 are year 1, 3-4 year 2, ... The semester condition is checked again by the
+        # UPDATE itself, so a concurrent promotion of the same cohort cannot move anyone twice.
+        moved = db.query(models.Student).filter(
+            models.Student.roll_no.in_(rolls),
+            models.Student.semester == data.semester
+        ).update({
+            models.Student.semester: models.Student.semester + 1,
+            models.Student.year: (models.Student.semester + 2) // 2,
+        }, synchronize_session=False)
+        if moved != len(rolls):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Cohort was promoted concurrently, nothing changed")
+        pursuing.update({"status": "Completed"}, synchronize_session=False)
+        report["enrollments_created"] = _enroll_matching(db, models.Student.roll_no.in_(rolls))
+        # New enrollments bumped their classes' analytics versions in _enroll_matching; the
+        # status change to Completed does not enter the summaries
+        ranks.mark_stale(db)
+        db.commit()
+        # Dashboards show next semester's courses and materials from now on
+        section_feed_cache.invalidate()
+        return report
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Promotion failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- ARREAR MANAGEMENT SYSTEM ---
+def _find_vh_column(df):
+    """Returns the register number column of an arrear sheet (VH NO / REG NO)."""
+    return next((c for c in df.columns if "VH NO" in c or "REG NO" in c or "VHNO" in c), None)
+
 @app.post("/admin/arrears/preview")
 async def preview_arrears(
     file: UploadFile = File(...),
@@ -501,44 +770,133 @@ async def preview_arrears(
             df = pd.read_excel(io.BytesIO(contents))
 
         df.columns = [str(c).strip().upper() for c in df.columns]
-        vh_col = next((c for c in df.columns if "VH NO" in c or "REG NO" in c or "VHNO" in c), None)
+        vh_col = _find_vh_column(df)
         
         if not vh_col:
             raise HTTPException(status_code=400, detail="Could not find 'VH NO' column in file.")
 
-        preview_results = []
-        for _, row in df.iterrows():
-            vh_val = str(row[vh_col]).strip()
-            if not vh_val or vh_val.lower() == 'nan':
-                continue
+        # Normalise the columns we need once instead of per row
+        df = df[df[vh_col].notna()].copy()
+        df["_VH"] = df[vh_col].astype(str).str.strip()
+        df = df[(df["_VH"] != "") & (df["_VH"].str.lower() != "nan")]
+        codes = df["SUBJECT CODE"] if "SUBJECT CODE" in df.columns else pd.Series("N/A", index=df.index)
+        df["_CODE"] = codes.fillna("N/A").astype(str).str.strip().str.upper()
+        df["_DUP"] = df.duplicated(subset=["_VH", "_CODE"], keep="first")
+
+        # 🌟 ONE query for the whole file: look up every VH number at once and
+        # classify each row against the selected class in memory
+        vh_numbers = df["_VH"].unique().tolist()
+        students = {}
+        if vh_numbers:
+            rows = db.query(
+                models.Student.roll_no,
+                models.Student.name,
+                models.Student.year,
+                models.Student.semester,
+                models.Student.section
+            ).filter(models.Student.roll_no.in_(vh_numbers)).all()
+            students = {r.roll_no: r for r in rows}
 
-            student = db.query(models.Student).filter(
-                models.Student.roll_no == vh_val,
-                models.Student.year == year,
-                models.Student.semester == semester,
-                models.Student.section == section
-            ).first()
+        preview_results = []
+        counts = {"ready": 0, "not_found": 0, "other_class": 0, "duplicates": 0}
+        for row in df.to_dict("records"):
+            vh_val = row["_VH"]
+            student = students.get(vh_val)
+            in_class = (
+                student is not None
+                and student.year == year
+                and student.semester == semester
+                and student.section == section
+            )
 
-            status_msg = "✅ Ready" if student else "❌ Not found in selected class"
+            if row["_DUP"]:
+                status_msg = "⚠️ Duplicate row in file"
+                counts["duplicates"] += 1
+            elif in_class:
+                status_msg = "✅ Ready"
+                counts["ready"] += 1
+            elif student:
+                status_msg = f"❌ Belongs to Year {student.year} Sem {student.semester} Sec {student.section}"
+                counts["other_class"] += 1
+            else:
+                status_msg = "❌ Not found in selected class"
+                counts["not_found"] += 1
             
             preview_results.append({
                 "vh_no": vh_val,
                 "name": student.name if student else "Unknown",
                 "sem_no": str(row.get('SEM NO', 'N/A')),
-                "subject_code": str(row.get('SUBJECT CODE', 'N/A')).strip().upper(),
+                "subject_code": row["_CODE"],
                 "subject_name": str(row.get('SUBJECT NAME', 'N/A')),
                 "status": status_msg,
-                "is_valid": student is not None
+                "is_valid": in_class and not row["_DUP"],
+                "is_duplicate": bool(row["_DUP"])
             })
 
-        return {"preview": preview_results}
+        return {"preview": preview_results, "summary": counts}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Arrear preview error: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+ARREAR_BATCH_SIZE = 500
+
+def _upsert_arrears(db: Session, records: list, batch_id: Optional[int] = None):
+    """
+    Inserts new arrear rows, updates changed ones and skips identical ones.
+    Rows are matched on (roll_no, subject_code, semester) and written in batches.
+    Every row in the sheet (inserted, updated or unchanged) is recorded as a member of `batch_id`,
+    so undoing an import only removes rows that no other import still contains.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    compare_fields = ("name", "batch", "subject_name")
+
+    # Last row wins if the sheet repeats the same key
+    by_key = {(r["roll_no"], r["subject_code"], r["semester"]): r for r in records}
+    roll_numbers = list({k[0] for k in by_key})
+
+    existing = {}
+    for i in range(0, len(roll_numbers), ARREAR_BATCH_SIZE):
+        chunk = roll_numbers[i:i + ARREAR_BATCH_SIZE]
+        for row in db.query(models.Arrear).filter(models.Arrear.roll_no.in_(chunk)):
+            existing[(row.roll_no, row.subject_code, row.semester)] = row
+
+    to_insert, to_update = [], []
+    for key, record in by_key.items():
+        current = existing.get(key)
+        if current is None:
+            to_insert.append({**record, "import_batch_id": batch_id})
+        elif any(getattr(current, f) != record[f] for f in compare_fields):
+            to_update.append({"id": current.id, **{f: record[f] for f in compare_fields}})
+        else:
+            counts["unchanged"] += 1
+
+    for i in range(0, len(to_insert), ARREAR_BATCH_SIZE):
+        db.execute(insert(models.Arrear), to_insert[i:i + ARREAR_BATCH_SIZE])
+    for i in range(0, len(to_update), ARREAR_BATCH_SIZE):
+        db.execute(update(models.Arrear), to_update[i:i + ARREAR_BATCH_SIZE])
+
+    if batch_id is not None:
+        keys = list(by_key)
+        arrear_key = tuple_(models.Arrear.roll_no, models.Arrear.subject_code, models.Arrear.semester)
+        for i in range(0, len(keys), ARREAR_BATCH_SIZE):
+            db.execute(insert(models.ArrearImportRow).from_select(
+                ["batch_id", "arrear_id"],
+                select(literal(batch_id), models.Arrear.id).where(arrear_key.in_(keys[i:i + ARREAR_BATCH_SIZE]))
+            ))
+
+    counts["inserted"] = len(to_insert)
+    counts["updated"] = len(to_update)
+    return counts
+
 @app.post("/admin/upload-arrears")
-async def upload_arrears(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_arrears(
+    file: UploadFile = File(...),
+    uploaded_by: Optional[str] = Form("Admin"),
+    db: Session = Depends(get_db)
+):
     if not (file.filename.endswith('.csv') or file.filename.endswith('.xlsx')):
         raise HTTPException(status_code=400, detail="Only CSV or Excel (.xlsx) files are allowed")
     
@@ -549,10 +907,11 @@ async def upload_arrears(file: UploadFile = File(...), db: Session = Depends(get
         timestamp = int(time.time())
         safe_filename = file.filename.replace(" ", "_")
         saved_filename = f"arrear_{timestamp}_{safe_filename}"
-        file_path = os.path.join(UPLOAD_DIR, saved_filename)
-        
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        upload = storage.save_upload(
+            db, contents, saved_filename, "arrear",
+            original_name=file.filename, uploaded_by=uploaded_by
+        )
+        saved_filename = upload.filename
         # -------------------------------------------------------------------------
             
         if file.filename.endswith('.csv'):
@@ -561,28 +920,40 @@ async def upload_arrears(file: UploadFile = File(...), db: Session = Depends(get
             df = pd.read_excel(io.BytesIO(contents))
         
         df.columns = [str(c).strip().upper() for c in df.columns]
-        vh_col = next((c for c in df.columns if "VH NO" in c or "REG NO" in c or "VHNO" in c), None)
+        vh_col = _find_vh_column(df)
 
-        success_count = 0
-        for _, row in df.iterrows():
+        records = []
+        for row in df.to_dict("records"):
             reg_no = str(row.get(vh_col)).strip()
             if not reg_no or reg_no.lower() == 'nan' or "REG NO" in reg_no:
                 continue
             
-            new_arrear = models.Arrear(
-                roll_no=reg_no,
-                name=str(row.get('NAME OF THE STUDENT', 'N/A')),
-                semester=str(row.get('SEM NO', 'N/A')),
-                subject_code=str(row.get('SUBJECT CODE', 'N/A')).strip().upper(),
-                subject_name=str(row.get('SUBJECT NAME', 'N/A')),
-                batch="2024-2028"
-            )
-            db.add(new_arrear)
-            success_count += 1
-            
+            records.append({
+                "roll_no": reg_no,
+                "name": str(row.get('NAME OF THE STUDENT', 'N/A')),
+                "semester": str(row.get('SEM NO', 'N/A')),
+                "subject_code": str(row.get('SUBJECT CODE', 'N/A')).strip().upper(),
+                "subject_name": str(row.get('SUBJECT NAME', 'N/A')),
+                "batch": "2024-2028"
+            })
+
+        batch = models.ImportBatch(
+            kind="arrears",
+            filename=saved_filename,
+            original_name=file.filename,
+            row_count=len(records)
+        )
+        db.add(batch)
+        db.flush()
+
+        counts = _upsert_arrears(db, records, batch_id=batch.id)
         db.commit()
         return {
-            "message": f"Successfully uploaded {success_count} arrear records.",
+            "message": (
+                f"Arrear upload complete: {counts['inserted']} added, "
+                f"{counts['updated']} updated, {counts['unchanged']} unchanged."
+            ),
+            **counts,
             "file_id": saved_filename
         }
         
@@ -593,60 +964,62 @@ async def upload_arrears(file: UploadFile = File(...), db: Session = Depends(get
 
 # 🌟 NEW ENDPOINT: Fetches all uploaded Arrear files for the Admin Panel UI
 @app.get("/admin/arrears/files")
-def get_uploaded_arrear_files():
-    files_list = []
-    if not os.path.exists(UPLOAD_DIR):
-        return files_list
-        
-    for filename in os.listdir(UPLOAD_DIR):
-        if filename.startswith("arrear_") and (filename.endswith(".csv") or filename.endswith(".xlsx")):
-            parts = filename.split("_", 2)
-            if len(parts) >= 3:
-                try:
-                    uploaded_at = int(parts[1])
-                    files_list.append({
-                        "filename": filename,
-                        "uploaded_at": uploaded_at
-                    })
-                except ValueError:
-                    continue
-                    
-    files_list.sort(key=lambda x: x["uploaded_at"], reverse=True)
-    return files_list
+def get_uploaded_arrear_files(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    return _list_uploads(db, "arrear", response, limit, offset)
 
 # 🌟 NEW ENDPOINT: Deletes the Arrear file AND all records inside it
 @app.delete("/admin/arrears/file/{filename}")
 def delete_arrear_file(filename: str, db: Session = Depends(get_db)):
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    upload = storage.find_upload(db, filename, "arrear")
+    batch = db.query(models.ImportBatch).filter(
+        models.ImportBatch.kind == "arrears",
+        models.ImportBatch.filename == filename
+    ).first()
     
-    if not os.path.exists(file_path):
+    if not batch and not (upload and os.path.exists(upload.path)):
         raise HTTPException(status_code=404, detail="File not found on server")
         
     try:
-        # 1. Read the file to find out WHICH student arrears to delete
-        if filename.endswith('.csv'):
-            df = pd.read_csv(file_path)
+        if batch:
+            # 1. Remove the rows this upload contained, unless another upload still contains them
+            member = models.ArrearImportRow
+            db.query(models.Arrear).filter(
+                models.Arrear.id.in_(select(member.arrear_id).where(member.batch_id == batch.id)),
+                ~exists().where(member.arrear_id == models.Arrear.id, member.batch_id != batch.id)
+            ).delete(synchronize_session=False)
+            db.query(member).filter(member.batch_id == batch.id).delete(synchronize_session=False)
+            db.delete(batch)
         else:
-            df = pd.read_excel(file_path)
+            # 1. Legacy upload made before batches were recorded: read the keys from the file
+            if filename.endswith('.csv'):
+                df = pd.read_csv(upload.path)
+            else:
+                df = pd.read_excel(upload.path)
+                
+            df.columns = [str(c).strip().upper() for c in df.columns]
+            vh_col = _find_vh_column(df)
             
-        df.columns = [str(c).strip().upper() for c in df.columns]
-        vh_col = next((c for c in df.columns if "VH NO" in c or "REG NO" in c or "VHNO" in c), None)
-        
-        if vh_col:
-            for _, row in df.iterrows():
-                reg_no = str(row.get(vh_col)).strip()
-                subj_code = str(row.get('SUBJECT CODE', 'N/A')).strip().upper()
-                if reg_no and reg_no.lower() != 'nan':
-                    # Delete the specific arrear matching this roll_no and subject
+            if vh_col:
+                keys = set()
+                for row in df.to_dict("records"):
+                    reg_no = str(row.get(vh_col)).strip()
+                    subj_code = str(row.get('SUBJECT CODE', 'N/A')).strip().upper()
+                    if reg_no and reg_no.lower() != 'nan':
+                        keys.add((reg_no, subj_code))
+                if keys:
                     db.query(models.Arrear).filter(
-                        models.Arrear.roll_no == reg_no,
-                        models.Arrear.subject_code == subj_code
+                        tuple_(models.Arrear.roll_no, models.Arrear.subject_code).in_(list(keys))
                     ).delete(synchronize_session=False)
         
+        # 2. Drop the stored file (the blob is removed once nothing else references it)
+        if upload:
+            storage.release_upload(db, record=upload)
         db.commit()
-        
-        # 2. Delete the physical file from the server
-        os.remove(file_path)
         return {"message": "Arrear file and associated records deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -664,11 +1037,9 @@ def get_student_arrears(roll_no: str, db: Session = Depends(get_db)):
 async def add_company(name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
     try:
         filename = f"logo_{int(time.time())}_{file.filename}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        upload = storage.save_upload(db, file.file, filename, "logo", original_name=file.filename, uploaded_by="Admin")
         
-        new_company = models.Company(name=name, logo_url=f"http://localhost:8000/static/{filename}")
+        new_company = models.Company(name=name, logo_url=storage.static_url(upload))
         db.add(new_company)
         db.commit()
         return {"message": "Company added successfully"}
@@ -679,7 +1050,12 @@ async def add_company(name: str = Form(...), file: UploadFile = File(...), db: S
 
 @app.get("/companies")
 def get_companies(db: Session = Depends(get_db)):
-    return db.query(models.Company).all()
+    return [{
+        "id": c.id,
+        "name": c.name,
+        "logo_url": c.logo_url,
+        "logo_sizes": images.derivative_urls(c.logo_url)
+    } for c in db.query(models.Company).all()]
 
 @app.post("/admin/placed-students")
 async def add_placed_student(
@@ -692,13 +1068,11 @@ async def add_placed_student(
 ):
     try:
         filename = f"placed_{int(time.time())}_{file.filename}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        upload = storage.save_upload(db, file.file, filename, "placed_photo", original_name=file.filename, uploaded_by="Admin")
             
         new_placement = models.PlacedStudent(
             name=name, dept=dept, lpa=lpa, 
-            company_name=company, photo_url=f"http://localhost:8000/static/{filename}"
+            company_name=company, photo_url=storage.static_url(upload)
         )
         db.add(new_placement)
         db.commit()
@@ -710,7 +1084,16 @@ async def add_placed_student(
 
 @app.get("/placed-students")
 def get_placed_students(db: Session = Depends(get_db)):
-    return db.query(models.PlacedStudent).all()
+    return [{
+        "id": s.id,
+        "name": s.name,
+        "dept": s.dept,
+        "lpa": s.lpa,
+        "company_name": s.company_name,
+        "photo_url": s.photo_url,
+        "linkedin_url": s.linkedin_url,
+        "photo_sizes": images.derivative_urls(s.photo_url)
+    } for s in db.query(models.PlacedStudent).all()]
 
 # --- FACULTY: MARKS & ATTENDANCE ---
 
@@ -718,39 +1101,134 @@ def get_placed_students(db: Session = Depends(get_db)):
 def get_faculty_courses(staff_no: str, db: Session = Depends(get_db)):
     return db.query(models.Course).filter(models.Course.faculty_id == staff_no).all()
 
-@app.get("/marks/section")
-def get_section_marks(course_code: str, section: Optional[str] = "A", db: Session = Depends(get_db)):
-    results = db.query(
+SECTION_MARK_SORTS = {
+    "roll_no": models.AcademicData.student_roll_no,
+    "name": models.Student.name,
+    "total": models.AcademicData.cia_total,
+    "cia1": models.AcademicData.cia1_effective,
+    "cia2": models.AcademicData.cia2_effective,
+    "attendance": models.AcademicData.subject_attendance,
+}
+
+def _section_marks_query(
+    db: Session,
+    course_code: Optional[str],
+    section: Optional[str],
+    sort: str = "roll_no",
+    order: str = "asc",
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+):
+    """Marks rows for /marks/section and its export; a None course or section means all of them."""
+    if sort not in SECTION_MARK_SORTS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SECTION_MARK_SORTS)}; order asc or desc")
+
+    query = db.query(
         models.Student.name,
         models.AcademicData.student_roll_no,
+        models.AcademicData.course_code,
+        models.AcademicData.section,
         models.AcademicData.cia1_marks,
         models.AcademicData.cia1_retest,
         models.AcademicData.ia1_marks,
         models.AcademicData.cia2_marks,
         models.AcademicData.cia2_retest,
         models.AcademicData.ia2_marks,
-        models.AcademicData.subject_attendance
+        models.AcademicData.subject_attendance,
+        models.AcademicData.cia1_effective,
+        models.AcademicData.cia2_effective,
+        models.AcademicData.cia_total
     ).join(
         models.AcademicData, models.Student.roll_no == models.AcademicData.student_roll_no
-    ).filter(
-        models.AcademicData.course_code == course_code.upper().strip(),
-        models.AcademicData.section == section
-    ).all()
+    )
+    if course_code:
+        query = query.filter(models.AcademicData.course_code == course_code.upper().strip())
+    if section:
+        query = query.filter(models.AcademicData.section == section)
+    # Filtering and sorting by total run in SQL on the stored column
+    if min_total is not None:
+        query = query.filter(models.AcademicData.cia_total >= min_total)
+    if max_total is not None:
+        query = query.filter(models.AcademicData.cia_total <= max_total)
+
+    sort_col = SECTION_MARK_SORTS[sort]
+    return query.order_by(
+        models.AcademicData.course_code, models.AcademicData.section,
+        sort_col.desc() if order == "desc" else sort_col.asc(), models.AcademicData.student_roll_no
+    )
+
+@app.get("/marks/section")
+def get_section_marks(
+    response: Response,
+    course_code: str,
+    section: Optional[str] = "A",
+    sort: str = "roll_no",
+    order: str = "asc",
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    query = _section_marks_query(db, course_code, section, sort, order, min_total, max_total)
+    if limit is not None:
+        response.headers["X-Total-Count"] = str(query.count())
+        query = query.offset(offset).limit(limit)
+    results = query.all()
     
     return [
         {
-            "name": row[0],
-            "roll_no": row[1],
-            "cia1_marks": row[2] or 0,
-            "cia1_retest": row[3] or 0,
-            "ia1_marks": row[4] or 0,
-            "cia2_marks": row[5] or 0,
-            "cia2_retest": row[6] or 0,
-            "ia2_marks": row[7] or 0,
-            "subject_attendance": row[8] or 0
+            "name": row.name,
+            "roll_no": row.student_roll_no,
+            "cia1_marks": row.cia1_marks or 0,
+            "cia1_retest": row.cia1_retest or 0,
+            "ia1_marks": row.ia1_marks or 0,
+            "cia2_marks": row.cia2_marks or 0,
+            "cia2_retest": row.cia2_retest or 0,
+            "ia2_marks": row.ia2_marks or 0,
+            "subject_attendance": row.subject_attendance or 0,
+            "cia1_effective": row.cia1_effective or 0,
+            "cia2_effective": row.cia2_effective or 0,
+            "total": row.cia_total or 0
         } for row in results
     ]
 
+@app.get("/marks/section/export")
+def export_section_marks(
+    course_code: Optional[str] = None,
+    section: Optional[str] = None,
+    format: str = "csv",
+    sort: str = "roll_no",
+    order: str = "asc",
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+):
+    """
+    Section marks as a CSV or XLSX download for the exam cell. Leave out `section` (or
+    `course_code` too) to export every section of a course, or the whole department.
+    """
+    if format not in exports.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(exports.EXPORT_FORMATS)}")
+    if section and section.lower() == "all":
+        section = None
+
+    # The session lives as long as the download, not the request handler, so it is closed by the stream
+    db = SessionLocal()
+    try:
+        query = _section_marks_query(db, course_code, section, sort, order, min_total, max_total)
+    except HTTPException:
+        db.close()
+        raise
+
+    filename = "marks_{}_{}.{}".format(
+        (course_code or "all").upper().strip(), section or "all", format
+    )
+    return StreamingResponse(
+        exports.stream_marks(db, query, format),
+        media_type=exports.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @app.post("/marks/sync")
 def sync_marks(data: MarkSyncRequest, db: Session = Depends(get_db)):
     record = db.query(models.AcademicData).filter(
@@ -768,7 +1246,7 @@ def sync_marks(data: MarkSyncRequest, db: Session = Depends(get_db)):
     record.ia1_marks = data.ia1_marks
     record.ia2_marks = data.ia2_marks
     record.subject_attendance = data.subject_attendance
-    
+    invalidate_course_analytics(db, [(record.course_code, record.section)])
     db.commit()
     return {"message": "Sync successful"}
 
@@ -825,6 +1303,7 @@ async def process_marks_excel(
 def bulk_sync_excel_marks(request: BulkExcelSyncRequest, db: Session = Depends(get_db)):
     try:
         updated_count = 0
+        classes = set()
         for entry in request.data:
             record = db.query(models.AcademicData).filter(
                 models.AcademicData.student_roll_no == entry.vh_no,
@@ -832,7 +1311,9 @@ def bulk_sync_excel_marks(request: BulkExcelSyncRequest, db: Session = Depends(g
             ).first()
             if record:
                 setattr(record, request.entity, entry.mark)
+                classes.add((record.course_code, record.section))
                 updated_count += 1
+        invalidate_course_analytics(db, classes)
         db.commit()
         return {"message": f"Successfully updated {updated_count} student marks."}
     except Exception as e:
@@ -904,10 +1385,8 @@ def get_course_progress(course_code: str, section: str, db: Session = Depends(ge
     }
 
 # --- STUDENT: ACADEMIC PORTAL ---
-@app.get("/marks/cia")
-def get_student_marks(student_id: str, db: Session = Depends(get_db)):
-    marks = db.query(models.AcademicData).filter(models.AcademicData.student_roll_no == student_id).all()
-    return [{
+def _cia_summary(m):
+    return {
         "subject": m.subject if m.subject else m.course_code,
         "course_code": m.course_code,
         "cia1": m.cia1_marks or 0,
@@ -917,10 +1396,96 @@ def get_student_marks(student_id: str, db: Session = Depends(get_db)):
         "cia2_retest": m.cia2_retest or 0, 
         "ia2_marks": m.ia2_marks or 0,
         "subject_attendance": m.subject_attendance or 0,
-        "total": (max(m.cia1_marks or 0, m.cia1_retest or 0) + 
-                  max(m.cia2_marks or 0, m.cia2_retest or 0) + 
-                  (m.ia1_marks or 0) + (m.ia2_marks or 0))
-    } for m in marks]
+        "total": m.cia_total or 0
+    }
+
+@app.get("/marks/cia")
+def get_student_marks(student_id: str, db: Session = Depends(get_db)):
+    marks = db.query(models.AcademicData).filter(models.AcademicData.student_roll_no == student_id).all()
+    return [_cia_summary(m) for m in marks]
+
+DASHBOARD_FIELDS = {"profile", "marks", "arrears", "announcements", "materials"}
+
+def _section_feed(db: Session, section: str, course_codes: tuple):
+    """Announcements and course materials for one section (2 queries, cached per section + course list)."""
+    key = (section, course_codes)
+    cached = section_feed_cache.get(key)
+    if cached is not None:
+        return cached
+
+    announcements = db.query(models.Announcement, models.Faculty.name).outerjoin(
+        models.Faculty, models.Faculty.staff_no == models.Announcement.posted_by
+    ).filter(
+        models.Announcement.type.in_(["Global", "Student", "Subject", "Placement", "Lab"]),
+        (models.Announcement.section == "All") | (models.Announcement.section == section)
+    ).order_by(models.Announcement.id.desc()).all()
+
+    materials = {code: [] for code in course_codes}
+    if course_codes:
+        for mat in db.query(models.Material).filter(models.Material.course_code.in_(course_codes)).order_by(models.Material.id):
+            materials[mat.course_code].append({
+                "id": mat.id,
+                "type": mat.type,
+                "title": mat.title,
+                "file_link": mat.file_link,
+                "posted_by": mat.posted_by,
+                "created_at": mat.created_at
+            })
+
+    feed = {
+        "announcements": [{
+            "id": ann.id,
+            "title": ann.title,
+            "content": ann.content,
+            "type": ann.type,
+            "target_year": ann.target_year,
+            "external_link": ann.external_link,
+            "course_code": ann.course_code,
+            "section": ann.section,
+            "posted_by": ann.posted_by,
+            "created_at": ann.created_at,
+            "faculty_name": faculty_name or ann.posted_by
+        } for ann, faculty_name in announcements],
+        "materials": materials
+    }
+    return section_feed_cache.set(key, feed)
+
+@app.get("/student/{roll_no}/dashboard")
+def get_student_dashboard(roll_no: str, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Everything the student dashboard shows, in one call and a fixed number of queries.
+    `fields` narrows the payload, e.g. ?fields=profile,marks
+    """
+    wanted = DASHBOARD_FIELDS if not fields else {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - DASHBOARD_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    student = db.query(models.Student).filter(models.Student.roll_no == roll_no.strip()).first()
+    if not student: raise HTTPException(status_code=404, detail="Student not found")
+
+    payload = {}
+    if "profile" in wanted:
+        payload["profile"] = schemas.Student.model_validate(student).model_dump()
+
+    enrollments = []
+    if wanted & {"marks", "materials"}:
+        enrollments = db.query(models.AcademicData).filter(models.AcademicData.student_roll_no == student.roll_no).all()
+    if "marks" in wanted:
+        payload["marks"] = [_cia_summary(m) for m in enrollments]
+
+    if "arrears" in wanted:
+        payload["arrears"] = db.query(models.Arrear).filter(models.Arrear.roll_no == student.roll_no).all()
+
+    if wanted & {"announcements", "materials"}:
+        course_codes = tuple(sorted({m.course_code for m in enrollments if m.course_code}))
+        feed = _section_feed(db, student.section, course_codes)
+        if "announcements" in wanted:
+            payload["announcements"] = feed["announcements"]
+        if "materials" in wanted:
+            payload["materials"] = feed["materials"]
+
+    return payload
 
 # --- MATERIALS & ANNOUNCEMENTS ---
 
@@ -941,12 +1506,13 @@ async def upload_material(
         
         if file:
             filename = f"{clean_course_code}_{int(time.time())}_{file.filename}"
-            file_location = os.path.join(UPLOAD_DIR, filename)
-            with open(file_location, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            file_link = f"http://localhost:8000/static/{filename}"
+            upload = storage.save_upload(db, file.file, filename, "material", original_name=file.filename, uploaded_by=posted_by)
+            file_link = storage.static_url(upload)
         elif url:
-            file_link = url
+            # Links must point elsewhere; stored files are only ever referenced through uploads
+            if not storage.is_external(url.strip()):
+                raise HTTPException(status_code=400, detail="url must be an http(s) link")
+            file_link = url.strip()
         else:
             raise HTTPException(status_code=400, detail="Either file or url required")
 
@@ -967,7 +1533,10 @@ async def upload_material(
         db.add(db_material)
         db.commit()
         db.refresh(db_material)
+        section_feed_cache.invalidate()
         return db_material
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1001,12 +1570,34 @@ def get_materials_by_course_section(course_code: str, section: Optional[str] = N
     clean_code = course_code.strip().upper()
     return db.query(models.Material).filter(models.Material.course_code.ilike(f"%{clean_code}%")).all()
 
+@app.get("/materials/{material_id}/download")
+def download_material(material_id: int, db: Session = Depends(get_db)):
+    """Resolves a material to its stored file; the bytes come from Python or the front proxy (FILE_SERVING_MODE)."""
+    mat = db.query(models.Material).filter(models.Material.id == material_id).first()
+    if not mat: raise HTTPException(status_code=404, detail="Material not found")
+
+    if storage.is_external(mat.file_link):
+        # External resources (YouTube videos, Drive links) are just forwarded
+        return RedirectResponse(mat.file_link)
+    # Only files inside the upload folders are served, whatever the stored link says. Registered
+    # uploads come first; a link written by our own upload endpoints before the registry (or its
+    # backfill) knew the file still resolves, as long as it stays inside those folders.
+    path = storage.registered_path(db, mat.file_link) or storage.resolve_path(mat.file_link)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File missing on server")
+
+    upload = db.query(models.UploadedFile).filter(models.UploadedFile.path == path).first()
+    download_name = upload.original_name if upload else os.path.basename(path)
+    return serve_file(path, filename=download_name)
+
 @app.delete("/materials/{material_id}")
 def delete_material(material_id: int, db: Session = Depends(get_db)):
     mat = db.query(models.Material).filter(models.Material.id == material_id).first()
     if not mat: raise HTTPException(status_code=404, detail="Material not found")
+    storage.release_upload(db, mat.file_link)
     db.delete(mat)
     db.commit()
+    section_feed_cache.invalidate()
     return {"message": "Deleted"}
 
 @app.post("/announcements")
@@ -1026,6 +1617,7 @@ def create_announcement(announcement: schemas.AnnouncementCreate, db: Session =
     db.add(db_announcement)
     db.commit()
     db.refresh(db_announcement)
+    section_feed_cache.invalidate()
     return db_announcement
 
 @app.get("/announcements")
@@ -1113,6 +1705,7 @@ def delete_announcement(announcement_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Announcement not found")
     db.delete(ann)
     db.commit()
+    section_feed_cache.invalidate()
     return {"message": "Announcement deleted successfully"}
 # 🌟 NEW ENDPOINT: Fetches ONLY the announcements posted by the logged-in faculty
 @app.get("/announcements/faculty-posts")
@@ -1130,6 +1723,7 @@ def delete_announcement(announcement_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Announcement not found")
     db.delete(ann)
     db.commit()
+    section_feed_cache.invalidate()
     return {"message": "Announcement deleted successfully"}
 
 # --- PROFILES & PHOTO UPLOADS ---
@@ -1145,11 +1739,11 @@ async def upload_faculty_photo(staff_no: str, file: UploadFile = File(...), db:
     faculty = db.query(models.Faculty).filter(models.Faculty.staff_no == staff_no.strip()).first()
     if not faculty: raise HTTPException(status_code=404, detail="Faculty not found")
     filename = f"faculty_{staff_no.strip()}_{int(time.time())}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as buffer: shutil.copyfileobj(file.file, buffer)
-    faculty.profile_pic = f"http://localhost:8000/static/{filename}"
+    upload = storage.save_upload(db, file.file, filename, "faculty_photo", original_name=file.filename, uploaded_by=staff_no.strip())
+    storage.release_upload(db, faculty.profile_pic, kind="faculty_photo")
+    faculty.profile_pic = storage.static_url(upload)
     db.commit()
-    return {"profile_pic": faculty.profile_pic}
+    return {"profile_pic": faculty.profile_pic, "sizes": images.derivative_urls(faculty.profile_pic)}
 
 @app.get("/student/{roll_no}", response_model=schemas.Student)
 def get_student(roll_no: str, db: Session = Depends(get_db)):
@@ -1162,11 +1756,11 @@ async def upload_student_photo(roll_no: str = Form(...), file: UploadFile = File
     student = db.query(models.Student).filter(models.Student.roll_no == roll_no.strip()).first()
     if not student: raise HTTPException(status_code=404, detail="Student not found")
     filename = f"student_{roll_no.strip()}_{int(time.time())}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as buffer: shutil.copyfileobj(file.file, buffer)
-    student.profile_pic = f"http://localhost:8000/static/{filename}"
+    upload = storage.save_upload(db, file.file, filename, "student_photo", original_name=file.filename, uploaded_by=roll_no.strip())
+    storage.release_upload(db, student.profile_pic, kind="student_photo")
+    student.profile_pic = storage.static_url(upload)
     db.commit()
-    return {"profile_pic": student.profile_pic}
+    return {"profile_pic": student.profile_pic, "sizes": images.derivative_urls(student.profile_pic)}
 
 @app.get("/courses", response_model=List[schemas.Course])
 def get_courses(semester: Optional[int] = None, section: Optional[str] = None, faculty_id: Optional[str] = None, db: Session = Depends(get_db)):
@@ -1207,6 +1801,8 @@ def update_student(data: dict, db: Session = Depends(get_db)):
         student.semester, student.section = int(data.get('semester', student.semester)), data.get('section')
         student.cgpa = float(data.get('cgpa', student.cgpa))
         if data.get('password'): user.password = data.get('password')
+        # A renamed student's old rank row goes now, before the new roll_no is flushed
+        ranks.mark_stale(db, *([orig_id] if str(orig_id) != str(new_id) else []))
         db.commit()
         return {"message": "Success"}
     except Exception as e:
@@ -1216,9 +1812,16 @@ def update_student(data: dict, db: Session = Depends(get_db)):
 @app.delete("/student/{roll_no}")
 def delete_student_profile(roll_no: str, db: Session = Depends(get_db)):
     try:
+        student = db.query(models.Student).filter(models.Student.roll_no == roll_no).first()
+        if student:
+            storage.release_upload(db, student.profile_pic, kind="student_photo")
+        classes = _enrolled_classes(db, models.AcademicData.student_roll_no == roll_no)
         db.query(models.AcademicData).filter(models.AcademicData.student_roll_no == roll_no).delete()
+        db.query(models.StudentRank).filter(models.StudentRank.roll_no == roll_no).delete()
         db.query(models.Student).filter(models.Student.roll_no == roll_no).delete()
         db.query(models.User).filter(models.User.id == roll_no).delete()
+        ranks.mark_stale(db)
+        invalidate_course_analytics(db, classes)
         db.commit()
         return {"message": "Deleted"}
     except Exception as e:
@@ -1248,6 +1851,9 @@ def update_faculty(data: dict, db: Session = Depends(get_db)):
 @app.delete("/faculty/{staff_no}")
 def delete_faculty_profile(staff_no: str, db: Session = Depends(get_db)):
     try:
+        faculty = db.query(models.Faculty).filter(models.Faculty.staff_no == staff_no.strip()).first()
+        if faculty:
+            storage.release_upload(db, faculty.profile_pic, kind="faculty_photo")
         db.query(models.Course).filter(models.Course.faculty_id == staff_no.strip()).update({"faculty_id": None})
         db.query(models.Faculty).filter(models.Faculty.staff_no == staff_no.strip()).delete()
         db.query(models.User).filter(models.User.id == staff_no.strip()).delete()
@@ -1257,15 +1863,56 @@ def delete_faculty_profile(staff_no: str, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _toppers_query(db: Session):
+    # Only what the toppers pages show, straight from the rank table (rebuilt in the background after writes)
+    return db.query(
+        models.Student.roll_no,
+        models.Student.name,
+        models.Student.year,
+        models.Student.section,
+        models.Student.cgpa,
+        models.StudentRank.overall_rank.label("rank"),
+        models.StudentRank.year_rank,
+        models.StudentRank.section_rank,
+    ).join(
+        models.StudentRank, models.StudentRank.roll_no == models.Student.roll_no
+    )
+
+def _ranked_students(query):
+    return [dict(row._mapping) for row in query.all()]
+
 @app.get("/admin/toppers/overall")
 def get_overall_toppers(year: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Student)
-    if year: query = query.filter(models.Student.year == year)
-    return query.order_by(models.Student.cgpa.desc()).limit(3).all()
+    # Served from the rank table; students tied on cgpa share a rank, so the top 3 places may list more than 3
+    query = _toppers_query(db)
+    if year:
+        query = query.filter(models.StudentRank.year == year, models.StudentRank.year_rank <= 3)
+        query = query.order_by(models.StudentRank.year_rank, models.Student.roll_no)
+    else:
+        query = query.filter(models.StudentRank.overall_rank <= 3)
+        query = query.order_by(models.StudentRank.overall_rank, models.Student.roll_no)
+    return _ranked_students(query)
 
 @app.get("/admin/toppers/classwise")
 def get_classwise_toppers(year: int, section: str, db: Session = Depends(get_db)):
-    return db.query(models.Student).filter(models.Student.year == year, models.Student.section == section).order_by(models.Student.cgpa.desc()).all()
+    query = _toppers_query(db).filter(
+        models.StudentRank.year == year, models.StudentRank.section == section
+    ).order_by(models.StudentRank.section_rank, models.Student.roll_no)
+    return _ranked_students(query)
+
+@app.get("/student/{roll_no}/rank")
+def get_student_rank(roll_no: str, db: Session = Depends(get_db)):
+    rank = db.get(models.StudentRank, roll_no)
+    if not rank:
+        raise HTTPException(status_code=404, detail="Student not ranked")
+    return {
+        "roll_no": rank.roll_no,
+        "cgpa": rank.cgpa,
+        "overall": {"rank": rank.overall_rank, "dense_rank": rank.overall_dense_rank, "out_of": rank.overall_size},
+        "year": {"year": rank.year, "rank": rank.year_rank, "dense_rank": rank.year_dense_rank, "out_of": rank.year_size},
+        "section": {"section": rank.section, "rank": rank.section_rank, "dense_rank": rank.section_dense_rank, "out_of": rank.section_size},
+        "refreshed_at": rank.refreshed_at,
+    }
 
 @app.get("/admin/faculty-performance")
 def get_faculty_performance(db: Session = Depends(get_db)):
@@ -1291,23 +1938,21 @@ def debug_all_materials(db: Session = Depends(get_db)):
 @app.get("/advisors")
 def get_all_advisors(db: Session = Depends(get_db)):
     """Fetches all assigned class advisors for the Admin Panel"""
-    # Look up all advisor records
-    # (Assuming your models.py has a ClassAdvisor model; adapt the model name if slightly different)
-    advisors = db.query(models.ClassAdvisor).all() if hasattr(models, 'ClassAdvisor') else []
-    
-    result = []
-    for adv in advisors:
-        # Find the faculty's name to display in the UI
-        faculty = db.query(models.Faculty).filter(models.Faculty.staff_no == adv.faculty_id).first()
-        result.append({
+    # Advisor rows and faculty names in a single joined query
+    rows = db.query(models.ClassAdvisor, models.Faculty.name).outerjoin(
+        models.Faculty, models.Faculty.staff_no == models.ClassAdvisor.faculty_id
+    ).order_by(models.ClassAdvisor.year, models.ClassAdvisor.section).all()
+
+    return [
+        {
             "advisor_no": adv.advisor_no,
             "faculty_id": adv.faculty_id,
-            "faculty_name": faculty.name if faculty else "Unknown Faculty",
+            "faculty_name": faculty_name or "Unknown Faculty",
             "year": adv.year,
             "semester": adv.semester,
             "section": adv.section
-        })
-    return result
+        } for adv, faculty_name in rows
+    ]
 
 @app.delete("/advisors/{advisor_no}")
 def delete_advisor(advisor_no: str, db: Session = Depends(get_db)):
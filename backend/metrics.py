@@ -0,0 +1,153 @@
+import os
+import time
+from sqlalchemy import event
+
+# prometheus_client is optional: without it requests are not measured and /metrics answers 503
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# --- 1. MULTI-WORKER SUPPORT ---
+# With `uvicorn --workers N` every worker has its own counters. Point PROMETHEUS_MULTIPROC_DIR at an
+# empty directory (wiped before each start) and the workers share their values through it;
+# /metrics then aggregates all of them, whichever worker answers the scrape.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+ENABLED = prometheus_client is not None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# --- 2. METRICS ---
+if ENABLED:
+    REQUESTS = Counter(
+        "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+    )
+    LATENCY = Histogram(
+        "http_request_duration_seconds", "Time spent handling a request", ["method", "route"],
+        buckets=LATENCY_BUCKETS
+    )
+    RESPONSE_SIZE = Histogram(
+        "http_response_size_bytes", "Response body size", ["method", "route"],
+        buckets=SIZE_BUCKETS
+    )
+    IN_FLIGHT = Gauge(
+        "http_requests_in_flight", "Requests currently being handled", ["method"],
+        multiprocess_mode="livesum"
+    )
+    DB_POOL_SIZE = Gauge(
+        "db_pool_size", "Configured DB connection pool size", multiprocess_mode="livesum"
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        "db_pool_checked_out", "DB connections currently in use", multiprocess_mode="livesum"
+    )
+    THREADPOOL_SIZE = Gauge(
+        "threadpool_size", "Worker threads available to sync endpoints", multiprocess_mode="livesum"
+    )
+    THREADPOOL_BUSY = Gauge(
+        "threadpool_busy", "Worker threads running sync endpoints", multiprocess_mode="livesum"
+    )
+    ADMISSION_ACTIVE = Gauge(
+        "admission_active_requests", "Requests holding a concurrency slot", ["route_class"],
+        multiprocess_mode="livesum"
+    )
+    ADMISSION_QUEUE_DEPTH = Gauge(
+        "admission_queue_depth", "Requests waiting for a concurrency slot", ["route_class"],
+        multiprocess_mode="livesum"
+    )
+    ADMISSION_REJECTED = Counter(
+        "admission_rejected_total", "Requests turned away by admission control", ["route_class", "reason"]
+    )
+
+def route_label(scope) -> str:
+    # Route template ("/student/{roll_no}"), never the raw path, to keep label cardinality bounded
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is not None:
+        return path
+    # Mounted apps (/static, /uploads) only leave their mount point behind in root_path
+    if scope.get("endpoint") is not None and scope.get("root_path"):
+        return scope["root_path"] + "/{path}"
+    return "unmatched"
+
+def _sample_threadpool():
+    # anyio's default limiter caps the threads FastAPI uses for `def` endpoints and dependencies
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+        limiter = current_default_thread_limiter()
+        THREADPOOL_SIZE.set(limiter.total_tokens)
+        THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    except Exception:
+        pass
+
+# --- 3. REQUEST MIDDLEWARE ---
+class MetricsMiddleware:
+    """Plain ASGI middleware: counts, times and sizes every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(method)
+        in_flight.inc()
+        _sample_threadpool()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = route_label(scope)
+            REQUESTS.labels(method, route, str(status)).inc()
+            LATENCY.labels(method, route).observe(elapsed)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+
+# --- 4. DB POOL GAUGES ---
+def instrument_engine(engine):
+    """Tracks pool checkouts with pool events (no polling at scrape time, so it works per worker)."""
+    if not ENABLED:
+        return
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.set(size())
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+# --- 5. EXPOSITION ---
+def render_latest():
+    """Returns (body, content_type) for a scrape, aggregating every worker in multiprocess mode."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_dead():
+    """Drops this worker's live gauges from the shared directory when it exits."""
+    if ENABLED and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, DateTime, Boolean, Index, event, func, case
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -11,6 +11,7 @@ class User(Base):
     id = Column(String, primary_key=True, index=True) # Staff_No or Roll_No or 'admin'
     role = Column(String) # Student, Faculty, HOD, Admin
     password = Column(String) 
+    import_batch_id = Column(Integer, ForeignKey("imports.id"), nullable=True, index=True) # Set for rows created by a bulk upload
 
     # Relationships
     faculty = relationship("Faculty", back_populates="user", uselist=False)
@@ -26,6 +27,7 @@ class Faculty(Base):
     designation = Column(String)
     doj = Column(String)
     profile_pic = Column(String, nullable=True) 
+    import_batch_id = Column(Integer, ForeignKey("imports.id"), nullable=True, index=True) # Set for rows created by a bulk upload
 
     # Relationships
     user = relationship("User", back_populates="faculty")
@@ -45,11 +47,51 @@ class Student(Base):
     cgpa = Column(Float, default=0.0)
     attendance_percentage = Column(Float, default=0.0) 
     profile_pic = Column(String, nullable=True) 
+    import_batch_id = Column(Integer, ForeignKey("imports.id"), nullable=True, index=True) # Set for rows created by a bulk upload
 
     # Relationships
     user = relationship("User", back_populates="student")
     academic_data = relationship("AcademicData", back_populates="student")
 
+class StudentRank(Base):
+    """CGPA ranks, rebuilt with window functions after cgpa/year/section changes (see ranks.py)."""
+    __tablename__ = "student_ranks"
+    __table_args__ = (
+        Index("ix_student_ranks_overall", "overall_rank"),
+        Index("ix_student_ranks_year", "year", "year_rank"),
+        Index("ix_student_ranks_section", "year", "section", "section_rank"),
+    )
+    roll_no = Column(String, ForeignKey("students.roll_no", ondelete="CASCADE"), primary_key=True)
+    year = Column(Integer)
+    section = Column(String)
+    cgpa = Column(Float, default=0.0)
+
+    # RANK leaves gaps after ties (1,1,3); DENSE_RANK does not (1,1,2)
+    overall_rank = Column(Integer)
+    overall_dense_rank = Column(Integer)
+    year_rank = Column(Integer)
+    year_dense_rank = Column(Integer)
+    section_rank = Column(Integer)
+    section_dense_rank = Column(Integer)
+
+    overall_size = Column(Integer)
+    year_size = Column(Integer)
+    section_size = Column(Integer)
+    refreshed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class RankState(Base):
+    """Single row (id 1): writes flag student_ranks as stale, the next rank read rebuilds it."""
+    __tablename__ = "rank_state"
+    id = Column(Integer, primary_key=True)
+    stale = Column(Boolean, default=False, nullable=False)
+    refreshed_at = Column(DateTime, nullable=True)
+
+class CacheVersion(Base):
+    """Shared generation counters: writers bump one, every worker drops what it cached under the old value."""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
 # ==========================================
 # 4. ACADEMIC STRUCTURE (Courses, Marks, Materials)
 # ==========================================
@@ -71,6 +113,12 @@ class Course(Base):
 
 class AcademicData(Base):
     __tablename__ = "academic_data"
+    # Section mark sheets sort and filter by total inside one course/section
+    __table_args__ = (
+        Index("ix_academic_data_course_section_total", "course_code", "section", "cia_total"),
+        # A student is enrolled in a course at most once; keeps set-based enrollment idempotent
+        Index("uq_academic_data_student_course", "student_roll_no", "course_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     student_roll_no = Column(String, ForeignKey("students.roll_no"))
     course_id = Column(Integer, ForeignKey("courses.id")) 
@@ -85,14 +133,47 @@ class AcademicData(Base):
     cia2_retest = Column(Float, default=0.0)
     ia1_marks = Column(Float, default=0.0) 
     ia2_marks = Column(Float, default=0.0) 
+
+    # Stored, write-time maintained: best of CIA vs retest, and the overall CIA total
+    cia1_effective = Column(Float, default=0.0)
+    cia2_effective = Column(Float, default=0.0)
+    cia_total = Column(Float, default=0.0)
     
     subject_attendance = Column(Float, default=0.0)
     innovative_assignment_marks = Column(Float, default=0.0) 
     status = Column(String, default="Pursuing") 
+    import_batch_id = Column(Integer, ForeignKey("imports.id"), nullable=True, index=True) # Set for rows created by a bulk upload
 
     student = relationship("Student", back_populates="academic_data")
     course = relationship("Course", back_populates="academic_data")
 
+    def recompute_totals(self):
+        self.cia1_effective = max(self.cia1_marks or 0, self.cia1_retest or 0)
+        self.cia2_effective = max(self.cia2_marks or 0, self.cia2_retest or 0)
+        self.cia_total = self.cia1_effective + self.cia2_effective + (self.ia1_marks or 0) + (self.ia2_marks or 0)
+
+def _greatest(a, b):
+    # Portable GREATEST() for SQLite and Postgres
+    a, b = func.coalesce(a, 0), func.coalesce(b, 0)
+    return case((a >= b, a), else_=b)
+
+# Column values for set-based refreshes: query.update(CIA_TOTAL_VALUES) after bulk mark writes
+CIA_TOTAL_VALUES = {
+    AcademicData.cia1_effective: _greatest(AcademicData.cia1_marks, AcademicData.cia1_retest),
+    AcademicData.cia2_effective: _greatest(AcademicData.cia2_marks, AcademicData.cia2_retest),
+    AcademicData.cia_total: (
+        _greatest(AcademicData.cia1_marks, AcademicData.cia1_retest)
+        + _greatest(AcademicData.cia2_marks, AcademicData.cia2_retest)
+        + func.coalesce(AcademicData.ia1_marks, 0)
+        + func.coalesce(AcademicData.ia2_marks, 0)
+    ),
+}
+
+@event.listens_for(AcademicData, "before_insert")
+@event.listens_for(AcademicData, "before_update")
+def _keep_cia_totals(mapper, connection, target):
+    target.recompute_totals()
+
 class Material(Base):
     __tablename__ = "materials"
     id = Column(Integer, primary_key=True, index=True)
@@ -159,6 +240,10 @@ class PlacedStudent(Base):
 
 class Arrear(Base):
     __tablename__ = "arrears"
+    # One row per student/subject/semester so re-uploading a sheet updates instead of duplicating
+    __table_args__ = (
+        Index("uq_arrears_roll_subject_sem", "roll_no", "subject_code", "semester", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     roll_no = Column(String, index=True)  # maps to VH NO
     name = Column(String)
@@ -166,6 +251,7 @@ class Arrear(Base):
     semester = Column(String)
     subject_code = Column(String)
     subject_name = Column(String)
+    import_batch_id = Column(Integer, ForeignKey("imports.id"), nullable=True, index=True) # Batch that first inserted this row
 
 # ==========================================
 # 7. SYLLABUS TOPICS (New Integration)
@@ -178,4 +264,55 @@ class SyllabusTopic(Base):
     section = Column(String, nullable=False)
     unit_no = Column(Integer, nullable=False)
     topic_name = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# ==========================================
+# 8. BULK IMPORT PROVENANCE
+# ==========================================
+class ImportBatch(Base):
+    __tablename__ = "imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True) # "users" or "arrears"
+    role = Column(String, nullable=True) # Student / Faculty for user imports
+    filename = Column(String, unique=True, index=True) # Saved file name in uploaded_files/
+    original_name = Column(String)
+    row_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ArrearImportRow(Base):
+    """Arrear rows each arrear import contained; undoing an import removes only rows no other import contains."""
+    __tablename__ = "arrear_import_rows"
+    batch_id = Column(Integer, ForeignKey("imports.id", ondelete="CASCADE"), primary_key=True)
+    arrear_id = Column(Integer, ForeignKey("arrears.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+# ==========================================
+# 9. UPLOAD REGISTRY
+# ==========================================
+class UploadedFile(Base):
+    __tablename__ = "uploads"
+    # Admin panels list one kind at a time, newest first
+    __table_args__ = (
+        Index("ix_uploads_kind_created_at", "kind", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, index=True, nullable=False) # Relative path on disk (a shared blob path for deduplicated uploads)
+    filename = Column(String, index=True, nullable=False) # Stored file name (what the UI deletes by)
+    kind = Column(String, nullable=False) # bulk_csv, arrear, material, logo, placed_photo, faculty_photo, student_photo, advisor_doc
+    role = Column(String, nullable=True) # Student / Faculty for bulk user CSVs
+    original_name = Column(String)
+    size_bytes = Column(Integer, default=0)
+    sha256 = Column(String(64), nullable=True, index=True)
+    uploaded_by = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # Content-addressed storage: one file on disk per distinct SHA-256
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, unique=True, nullable=False) # uploaded_files/blobs/ab/cd/<sha256><ext>
+    size_bytes = Column(Integer, default=0)
+    ref_count = Column(Integer, default=0) # Number of uploads (materials, logos, photos, ...) pointing here
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import logging
+import datetime
+import threading
+from collections import Counter
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# --- 1. CONFIG (opt-in) ---
+# PROFILE_TOKEN unset -> the middleware is not installed at all, so requests pay nothing.
+# When set, a request is profiled only if it carries the token:
+#   X-Profile: <token>        or        ?profile=<token>
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "logs/profiles")
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+# Sampling interval; X-Profile-Interval-Ms / ?profile_interval_ms= overrides it per request
+DEFAULT_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+MIN_INTERVAL_MS = 0.2
+
+ENABLED = PROFILE_TOKEN is not None
+PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# (file, function) of the frames a thread sits in while it has nothing to do; such samples are dropped.
+# Qualified by file so application functions that happen to share a name (get, wait) are kept.
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("thread.py", "_worker"),
+}
+
+# sys.setswitchinterval is process-wide: the first active sampler lowers it, the last one restores it
+_switch_lock = threading.Lock()
+_active_samplers = 0
+_original_switch_interval = None
+
+def _lower_switch_interval(interval: float):
+    global _active_samplers, _original_switch_interval
+    with _switch_lock:
+        if _active_samplers == 0:
+            _original_switch_interval = sys.getswitchinterval()
+        _active_samplers += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+
+def _restore_switch_interval():
+    global _active_samplers
+    with _switch_lock:
+        _active_samplers -= 1
+        if _active_samplers == 0:
+            sys.setswitchinterval(_original_switch_interval)
+
+# --- 2. SAMPLER ---
+class _Sampler(threading.Thread):
+    """
+    Snapshots every thread's stack at a fixed interval and counts identical stacks.
+    Sampling (rather than cProfile) also covers `def` endpoints running on the threadpool;
+    other requests served at the same moment show up too, so profile on a quiet worker.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        # Busy threads hold the GIL for up to the switch interval (5 ms), which would cap the sample rate
+        _lower_switch_interval(self.interval)
+        try:
+            self._sample(me)
+        finally:
+            _restore_switch_interval()
+
+    def _sample(self, me: int):
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me or (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# --- 3. STORAGE (folded stacks: flamegraph.pl / speedscope / inferno read them directly) ---
+def _save(profile_id: str, sampler: _Sampler, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # Keep only the newest PROFILE_KEEP profiles
+    metas = sorted(
+        (e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime, reverse=True
+    )
+    for old in metas[PROFILE_KEEP:]:
+        for suffix in (".json", ".folded"):
+            path = os.path.join(PROFILE_DIR, old.name[:-5] + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles(limit: int = 50) -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    metas = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    metas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    metas.sort(key=lambda m: m.get("created_at", ""), reverse=True)
+    return metas[:limit]
+
+def profile_path(profile_id: str):
+    """Path of a stored .folded profile, or None for unknown / malformed ids."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+# --- 4. MIDDLEWARE ---
+def _requested(scope) -> tuple:
+    """(profile?, interval seconds) from the X-Profile header or ?profile= flag."""
+    headers = dict(scope.get("headers") or [])
+    token = headers.get(b"x-profile", b"").decode("latin-1")
+    interval = headers.get(b"x-profile-interval-ms", b"").decode("latin-1")
+    if not token and scope.get("query_string"):
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        token = query.get("profile", [""])[0]
+        interval = interval or query.get("profile_interval_ms", [""])[0]
+    try:
+        interval_ms = max(MIN_INTERVAL_MS, float(interval)) if interval else DEFAULT_INTERVAL_MS
+    except ValueError:
+        interval_ms = DEFAULT_INTERVAL_MS
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()), interval_ms / 1000
+
+class ProfilingMiddleware:
+    """Profiles requests that carry the profiling token; every other request passes straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        wanted, interval = _requested(scope)
+        if not wanted:
+            await self.app(scope, receive, send)
+            return
+
+        # The id names files on disk, so it is always generated here: X-Request-ID comes from the
+        # client and could be reused to overwrite another profile. The request id is kept in the
+        # metadata instead, so a slow access log line can still be matched with its profile.
+        from .access_log import current_request_id
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        sampler = _Sampler(interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Joining the sampler and writing the files would block the event loop
+            await run_in_threadpool(sampler.stop)
+            from .metrics import route_label
+            meta = {
+                "id": profile_id,
+                "request_id": current_request_id(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_label(scope),
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "interval_ms": round(interval * 1000, 2),
+                "samples": sampler.samples,
+                "created_at": datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            }
+            try:
+                await run_in_threadpool(_save, profile_id, sampler, meta)
+            except OSError as e:
+                logger.warning(f"Could not store profile {profile_id}: {e}")
@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+import contextlib
+from typing import Optional
+from contextvars import ContextVar
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# --- 1. CONFIG ---
+# SQL_DEBUG_HEADERS=1 adds X-DB-Query-Count / X-DB-Time-Ms to every response (development only)
+DEBUG_HEADERS = os.environ.get("SQL_DEBUG_HEADERS", "").lower() in ("1", "true", "yes")
+# Requests that run more statements than this are logged as likely N+1 loops (0 disables the warning)
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "25"))
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "scope")
+
+    def __init__(self, scope=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.scope = scope # ASGI scope of the request, for naming the route
+
+# Stats of the request being handled; copied into the threadpool with the rest of the context
+_current: ContextVar = ContextVar("query_stats", default=None)
+
+def current_route() -> Optional[str]:
+    """'GET /route/{template}' of the request running the current statement, or None outside a request."""
+    stats = _current.get()
+    if stats is None or stats.scope is None:
+        return None
+    from .metrics import route_label
+    return f"{stats.scope['method']} {route_label(stats.scope)}"
+
+# --- 2. ENGINE HOOKS ---
+def instrument_engine(engine):
+    """Counts statements and DB time for the request (if any) that issued them."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        started = conn.info.get("query_started")
+        if stats is None or not started:
+            return
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started.pop()
+
+# --- 3. REQUEST MIDDLEWARE ---
+class QueryStatsMiddleware:
+    """Plain ASGI middleware: tracks queries per request, adds debug headers and enforces the budget."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _current.set(stats)
+        # Left on the scope for outer middlewares (the access log) once the request is done
+        scope["query_stats"] = stats
+
+        async def send_wrapper(message):
+            if DEBUG_HEADERS and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.seconds * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if QUERY_BUDGET and stats.count > QUERY_BUDGET:
+                from .metrics import route_label
+                logger.warning(
+                    f"{scope['method']} {route_label(scope)} ran {stats.count} queries "
+                    f"({stats.seconds * 1000:.1f} ms), budget is {QUERY_BUDGET}; possible N+1"
+                )
+
+# --- 4. TEST HELPER ---
+@contextlib.contextmanager
+def count_queries(engine):
+    """
+    Counts every statement run on `engine` inside the block, whichever thread runs it
+    (TestClient handles requests on its own thread). Backs the `count_queries` fixture in backend/tests:
+
+        with count_queries(engine) as q:
+            client.get("/advisors")
+        assert q.count <= 2
+    """
+    stats = QueryStats()
+    starts = []
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        starts.append(time.perf_counter())
+
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats.count += 1
+        if starts:
+            stats.seconds += time.perf_counter() - starts.pop()
+
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+        event.remove(engine, "after_cursor_execute", _after)
@@ -0,0 +1,147 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, select, insert, update, delete, func, literal
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# --- CGPA RANK TABLE ---
+# student_ranks is a materialised leaderboard: one INSERT ... SELECT with RANK/DENSE_RANK
+# window functions rebuilds it, so toppers lists and a student's own rank become indexed
+# lookups instead of a sort over the whole students table on every request.
+#
+# Overall and year ranks depend on every student, so a single CGPA edit cannot be patched in
+# locally. Writes flag the table as stale (mark_stale, O(1)); once their transaction commits,
+# a background thread rebuilds it. Reads only ever read the table. Writes that land while a
+# rebuild is queued share it, so a burst of edits or a whole import costs one rebuild.
+STATE_ID = 1
+
+# session.info key: this transaction marked the ranks stale, rebuild once it commits
+REBUILD_PENDING = "ranks_rebuild_pending"
+
+_rebuild_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ranks")
+_rebuild_lock = threading.Lock()
+_rebuild_queued = False
+
+def _set_state(db: Session, **values):
+    state = models.RankState
+    if not db.execute(update(state).where(state.id == STATE_ID).values(**values)).rowcount:
+        db.add(models.RankState(id=STATE_ID, **values))
+        db.flush()
+
+def mark_stale(db: Session, *removed_roll_nos: str):
+    """
+    Call in the same transaction as any write that changes cgpa, year or section, or adds/removes
+    students; the caller commits. Pass the old roll numbers of students being deleted or renamed:
+    their rank rows go now, so the students' FK is never left pointing at them.
+    """
+    if removed_roll_nos:
+        db.execute(delete(models.StudentRank).where(models.StudentRank.roll_no.in_(removed_roll_nos)))
+    _set_state(db, stale=True)
+    db.info[REBUILD_PENDING] = True
+
+def rebuild_if_stale(db: Session) -> bool:
+    """Rebuilds student_ranks if a write flagged it; the claim keeps concurrent rebuilders (any worker) to one."""
+    claimed = db.execute(
+        update(models.RankState)
+        .where(models.RankState.id == STATE_ID, models.RankState.stale.is_(True))
+        .values(stale=False)
+    ).rowcount
+    if not claimed:
+        db.rollback()
+        return False
+    refresh_ranks(db)
+    db.commit()
+    return True
+
+def _rebuild(bind):
+    global _rebuild_queued
+    with _rebuild_lock:
+        # Writes committed from here on queue a fresh run
+        _rebuild_queued = False
+    with Session(bind=bind) as db:
+        try:
+            rebuild_if_stale(db)
+        except Exception as e:
+            # The claim rolls back with it, so the flag stays set for the next write or restart
+            db.rollback()
+            logger.error(f"Rank rebuild failed: {e}")
+
+def schedule_rebuild(bind):
+    global _rebuild_queued
+    with _rebuild_lock:
+        if _rebuild_queued:
+            return
+        _rebuild_queued = True
+    _rebuild_pool.submit(_rebuild, bind)
+
+@event.listens_for(Session, "after_commit")
+def _rebuild_after_commit(session):
+    if session.info.pop(REBUILD_PENDING, False):
+        schedule_rebuild(session.get_bind())
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rebuild(session, previous_transaction):
+    # Savepoint rollbacks (parent is set) leave the outer transaction's flag in place
+    if previous_transaction.parent is None:
+        session.info.pop(REBUILD_PENDING, None)
+
+def refresh_ranks(db: Session):
+    """Rebuilds student_ranks from the current students table; the caller commits."""
+    s = models.Student
+    cgpa = func.coalesce(s.cgpa, 0.0)
+    order = cgpa.desc()
+    by_year = s.year
+    by_section = (s.year, s.section)
+
+    ranked = select(
+        s.roll_no,
+        s.year,
+        s.section,
+        cgpa,
+        func.rank().over(order_by=order),
+        func.dense_rank().over(order_by=order),
+        func.rank().over(partition_by=by_year, order_by=order),
+        func.dense_rank().over(partition_by=by_year, order_by=order),
+        func.rank().over(partition_by=by_section, order_by=order),
+        func.dense_rank().over(partition_by=by_section, order_by=order),
+        func.count().over(),
+        func.count().over(partition_by=by_year),
+        func.count().over(partition_by=by_section),
+        literal(datetime.datetime.utcnow(), models.StudentRank.refreshed_at.type),
+    )
+
+    r = models.StudentRank
+    # Old rows go first so a pending roll_no change can be flushed without tripping the FK
+    db.execute(delete(r))
+    db.flush()
+    db.execute(insert(r).from_select(
+        [
+            r.roll_no, r.year, r.section, r.cgpa,
+            r.overall_rank, r.overall_dense_rank,
+            r.year_rank, r.year_dense_rank,
+            r.section_rank, r.section_dense_rank,
+            r.overall_size, r.year_size, r.section_size,
+            r.refreshed_at,
+        ],
+        ranked,
+    ))
+    _set_state(db, stale=False, refreshed_at=datetime.datetime.utcnow())
+
+def ensure_ranks(db: Session):
+    """
+    On startup: builds the rank table when it is empty but students exist (first run / upgrade),
+    or finishes a rebuild a previous process flagged but did not get to.
+    """
+    state = db.get(models.RankState, STATE_ID)
+    empty = db.query(models.StudentRank.roll_no).first() is None
+    if empty and db.query(models.Student.roll_no).first() is not None:
+        refresh_ranks(db)
+        db.commit()
+        logger.info("Student rank table built.")
+    elif state is not None and state.stale:
+        rebuild_if_stale(db)
@@ -1,20 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 import shutil
 import os
 import time
 import logging
-from .. import models, database
+from .. import models, database, storage, ranks
 
-# Configure logging to catch those 500 errors in the console
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/advisors", tags=["Class Advisor"])
 
 # Define the base upload directory
-UPLOAD_DIR = "uploads/advisor_docs"
+UPLOAD_DIR = storage.ADVISOR_DIR
 
 # 1. Admin Logic: Assign a Faculty as a Class Advisor
 @router.post("/assign")
@@ -53,10 +52,45 @@ def get_advisor_class(faculty_id: str, db: Session = Depends(database.get_db)):
     if not mapping:
         raise HTTPException(status_code=404, detail="You are not assigned as a Class Advisor")
 
-    students = db.query(models.Student).filter(
+    # One statement: students plus per-student marks and arrear aggregates (no per-row follow-ups)
+    class_rolls = db.query(models.Student.roll_no).filter(
         models.Student.year == mapping.year,
         models.Student.section == mapping.section
-    ).all()
+    ).scalar_subquery()
+    marks = db.query(
+        models.AcademicData.student_roll_no.label("roll_no"),
+        func.count(models.AcademicData.id).label("courses"),
+        func.avg(models.AcademicData.cia_total).label("average_cia"),
+        func.avg(models.AcademicData.subject_attendance).label("average_attendance"),
+    ).filter(models.AcademicData.student_roll_no.in_(class_rolls)).group_by(models.AcademicData.student_roll_no).subquery()
+    arrears = db.query(
+        models.Arrear.roll_no.label("roll_no"),
+        func.count(models.Arrear.id).label("arrear_count"),
+    ).filter(models.Arrear.roll_no.in_(class_rolls)).group_by(models.Arrear.roll_no).subquery()
+
+    rows = db.query(
+        models.Student, marks.c.courses, marks.c.average_cia, marks.c.average_attendance, arrears.c.arrear_count
+    ).outerjoin(
+        marks, marks.c.roll_no == models.Student.roll_no
+    ).outerjoin(
+        arrears, arrears.c.roll_no == models.Student.roll_no
+    ).filter(
+        models.Student.year == mapping.year,
+        models.Student.section == mapping.section
+    ).order_by(models.Student.roll_no).all()
+
+    students = [
+        {
+            **{c.name: getattr(stu, c.name) for c in models.Student.__table__.columns},
+            "summary": {
+                "courses": courses or 0,
+                "average_cia": round(average_cia or 0, 2),
+                "average_attendance": round(average_attendance or 0, 2),
+                "arrear_count": arrear_count or 0,
+            },
+        }
+        for stu, courses, average_cia, average_attendance, arrear_count in rows
+    ]
     
     return {
         "class_info": mapping,
@@ -77,6 +111,7 @@ def update_student_stats(
     
     student.cgpa = cgpa
     student.attendance_percentage = attendance
+    ranks.mark_stale(db)
     db.commit()
     return {"message": "Student records updated successfully"}
 
@@ -91,20 +126,18 @@ async def upload_advisor_docs(
 ):
     try:
         # Create directory path
-        class_folder = os.path.join(UPLOAD_DIR, str(year), section)
-        os.makedirs(class_folder, exist_ok=True)
-        
         # Sanitize filename and add timestamp to prevent file collision/overwrite errors
         timestamp = int(time.time())
         safe_filename = f"{timestamp}_{file.filename.replace(' ', '_')}"
-        file_path = os.path.join(class_folder, safe_filename)
         
-        # Save actual file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save actual file to the shared blob store and record it in the uploads registry
+        upload = storage.save_upload(
+            db, file.file, safe_filename, "advisor_doc",
+            original_name=file.filename, uploaded_by="Class Advisor"
+        )
         
-        # Format path for DB (Web-friendly slashes)
-        db_file_link = file_path.replace("\\", "/")
+        # Host-relative link (static/blobs/...) so the frontend can prefix the API URL
+        db_file_link = storage.static_link(upload)
         
         # FIXED: Removed 'content' keyword because it caused 500 Internal Server Error
         new_doc = models.Material(
@@ -145,13 +178,8 @@ def delete_advisor_doc(doc_id: int, db: Session = Depends(database.get_db)):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Remove actual file from the local storage
-    if os.path.exists(doc.file_link):
-        try:
-            os.remove(doc.file_link)
-        except Exception as e:
-            logger.warning(f"Could not delete physical file: {str(e)}")
-        
+    # Drop the stored file (older docs live under uploads/advisor_docs, newer ones in the blob store)
+    storage.release_upload(db, doc.file_link, kind="advisor_doc")
     db.delete(doc)
     db.commit()
     return {"message": "Document removed successfully"}
\ No newline at end of file
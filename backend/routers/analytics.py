@@ -0,0 +1,100 @@
+# backend/routers/analytics.py
+import os
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from .. import models, database
+from ..cache import course_analytics_cache, course_analytics_version
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Components summarised for a course/section (column -> label in the response)
+COMPONENTS = {
+    "cia1_marks": "cia1",
+    "cia1_retest": "cia1_retest",
+    "cia1_effective": "cia1_effective",
+    "cia2_marks": "cia2",
+    "cia2_retest": "cia2_retest",
+    "cia2_effective": "cia2_effective",
+    "ia1_marks": "ia1",
+    "ia2_marks": "ia2",
+    "cia_total": "total",
+    "subject_attendance": "attendance",
+}
+
+# Pass thresholds; components without one report pass_rate as null.
+# CIA marks below CIA_PASS_MARK are flagged as failing on the faculty mark sheet; attendance
+# follows the ATTENDANCE_PASS_PERCENT rule. Both can be set per deployment through the environment.
+CIA_PASS_MARK = float(os.environ.get("CIA_PASS_MARK", "30"))
+ATTENDANCE_PASS_PERCENT = float(os.environ.get("ATTENDANCE_PASS_PERCENT", "75"))
+
+PASS_MARKS = {
+    "cia1_marks": CIA_PASS_MARK,
+    "cia1_effective": CIA_PASS_MARK,
+    "cia2_marks": CIA_PASS_MARK,
+    "cia2_effective": CIA_PASS_MARK,
+    "subject_attendance": ATTENDANCE_PASS_PERCENT,
+}
+
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+HISTOGRAM_BINS = 10
+
+def _clean(value):
+    # NaN (e.g. std of a single student) is not valid JSON
+    return None if pd.isna(value) else round(float(value), 2)
+
+def _summarise(df: pd.DataFrame) -> dict:
+    """Computes every statistic column-wise over the whole frame at once."""
+    stats = df.agg(["mean", "median", "std", "min", "max"])
+    cutoffs = df.quantile(PERCENTILES)
+    thresholds = pd.Series(PASS_MARKS).reindex(df.columns)
+    pass_rates = df.ge(thresholds, axis=1).mean() * 100
+
+    summary = {}
+    for column, label in COMPONENTS.items():
+        values = df[column].to_numpy()
+        upper = max(float(values.max()), 1.0)
+        counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(0.0, upper))
+        summary[label] = {
+            "mean": _clean(stats.at["mean", column]),
+            "median": _clean(stats.at["median", column]),
+            "std": _clean(stats.at["std", column]),
+            "min": _clean(stats.at["min", column]),
+            "max": _clean(stats.at["max", column]),
+            "pass_mark": PASS_MARKS.get(column),
+            "pass_rate": _clean(pass_rates[column]) if column in PASS_MARKS else None,
+            "percentiles": {f"p{int(p * 100)}": _clean(cutoffs.at[p, column]) for p in PERCENTILES},
+            "histogram": [
+                {"from": round(float(edges[i]), 2), "to": round(float(edges[i + 1]), 2), "count": int(counts[i])}
+                for i in range(len(counts))
+            ],
+        }
+    return summary
+
+# 1. COURSE / SECTION STATISTICS (cached until the next mark or enrollment write)
+@router.get("/course/{course_code}/{section}")
+def get_course_analytics(course_code: str, section: str, refresh: bool = Query(False), db: Session = Depends(database.get_db)):
+    code = course_code.upper().strip()
+    key = (code, section, course_analytics_version(db, code, section))
+    if not refresh:
+        cached = course_analytics_cache.get(key)
+        if cached is not None:
+            return cached
+
+    columns = [getattr(models.AcademicData, c) for c in COMPONENTS]
+    rows = db.query(*columns).filter(
+        models.AcademicData.course_code == code,
+        models.AcademicData.section == section
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No enrolled students for this course and section")
+
+    df = pd.DataFrame.from_records(rows, columns=list(COMPONENTS)).astype(float).fillna(0.0)
+    result = {
+        "course_code": code,
+        "section": section,
+        "students": len(df),
+        "components": _summarise(df),
+    }
+    return course_analytics_cache.set(key, result)
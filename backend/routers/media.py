@@ -0,0 +1,29 @@
+# backend/routers/media.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from .. import models, database, images
+from ..static_files import serve_file, IMMUTABLE_CACHE
+
+router = APIRouter(prefix="/images", tags=["Images"])
+
+# 1. SIZE-SELECTABLE IMAGE DERIVATIVES (e.g. /images/<sha256>/thumb.webp)
+@router.get("/{sha256}/{variant}")
+def get_image_derivative(sha256: str, variant: str, db: Session = Depends(database.get_db)):
+    size, _, fmt = variant.partition(".")
+    if size not in images.SIZES or fmt not in images.FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown image size or format")
+
+    blob = db.query(models.Blob).filter(models.Blob.sha256 == sha256).first()
+    if not blob or not images.is_image(blob.path):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Normally built at upload time; otherwise build it now and keep it on disk
+    try:
+        path = images.make_derivative(blob.path, sha256, size, fmt)
+    except Exception:
+        path = None
+    # Without Pillow (or for an image it cannot read) fall back to the original
+    path = path or blob.path
+
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": f'"{sha256}-{size}-{fmt}"'}
+    return serve_file(path, headers=headers)
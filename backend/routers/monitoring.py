@@ -0,0 +1,52 @@
+# backend/routers/monitoring.py
+from fastapi import APIRouter, HTTPException, Response, Query
+from fastapi.responses import FileResponse, JSONResponse
+from .. import metrics, slow_queries, profiling, health
+
+router = APIRouter(tags=["Monitoring"])
+
+# 1. PROMETHEUS SCRAPE TARGET
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+# 2. SLOW QUERY LOG (enabled with SLOW_QUERY_MS)
+@router.get("/admin/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=500)):
+    return {
+        "enabled": bool(slow_queries.SLOW_QUERY_MS),
+        "threshold_ms": slow_queries.SLOW_QUERY_MS,
+        "log_file": slow_queries.SLOW_QUERY_LOG,
+        "entries": slow_queries.recent(limit),
+    }
+
+# 3. REQUEST PROFILES (enabled with PROFILE_TOKEN)
+@router.get("/admin/profiles")
+def get_profiles(limit: int = Query(50, ge=1, le=500)):
+    return {"enabled": profiling.ENABLED, "profiles": profiling.list_profiles(limit)}
+
+@router.get("/admin/profiles/{profile_id}")
+def download_profile(profile_id: str):
+    """Folded stacks, ready for flamegraph.pl, speedscope or inferno."""
+    path = profiling.profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+# 4. LIVENESS / READINESS PROBES
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Process is up and the event loop answers; deliberately touches nothing else."""
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+def readyz():
+    """503 while the DB does not answer, upload dirs are not writable / full, or the pool is exhausted."""
+    ready, checks = health.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
@@ -3,11 +3,12 @@ from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os, time, shutil
-from .. import models, database
+from .. import models, database, storage, images
+from ..cache import section_feed_cache
 
 router = APIRouter(prefix="/placements", tags=["Placements"])
 
-UPLOAD_DIR = "uploaded_files"
+UPLOAD_DIR = storage.UPLOAD_DIR
 
 # 1. SEND TARGETED ANNOUNCEMENTS (Requirement 1)
 @router.post("/announcements")
@@ -29,6 +30,7 @@ def create_placement_announcement(
     )
     db.add(new_ann)
     db.commit()
+    section_feed_cache.invalidate()
     return {"message": "Placement notice broadcasted successfully"}
 
 # 2. UPLOAD PLACED STUDENT + LINKEDIN (Requirement 2)
@@ -42,16 +44,14 @@ async def add_placed_student(
     db: Session = Depends(database.get_db)
 ):
     filename = f"placed_{int(time.time())}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    upload = storage.save_upload(db, file.file, filename, "placed_photo", original_name=file.filename, uploaded_by="Admin")
             
     new_placement = models.PlacedStudent(
         name=name, 
         company_name=company, 
         lpa=lpa,
         linkedin_url=linkedin,
-        photo_url=f"http://localhost:8000/static/{filename}"
+        photo_url=storage.static_url(upload)
     )
     db.add(new_placement)
     db.commit()
@@ -61,11 +61,9 @@ async def add_placed_student(
 @router.post("/companies")
 async def add_company(name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(database.get_db)):
     filename = f"logo_{int(time.time())}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    upload = storage.save_upload(db, file.file, filename, "logo", original_name=file.filename, uploaded_by="Admin")
     
-    new_company = models.Company(name=name, logo_url=f"http://localhost:8000/static/{filename}")
+    new_company = models.Company(name=name, logo_url=storage.static_url(upload))
     db.add(new_company)
     db.commit()
     return {"message": "Logo added to homepage marquee"}
@@ -77,6 +75,7 @@ def delete_announcement(ann_id: int, db: Session = Depends(database.get_db)):
     if ann:
         db.delete(ann)
         db.commit()
+        section_feed_cache.invalidate()
         return {"message": "Notice deleted"}
     raise HTTPException(status_code=404, detail="Not found")
 
@@ -103,6 +102,7 @@ def delete_placed_student(student_id: int, db: Session = Depends(database.get_db
     student = db.query(models.PlacedStudent).filter(models.PlacedStudent.id == student_id).first()
     if not student:
         raise HTTPException(404, "Student record not found")
+    storage.release_upload(db, student.photo_url, kind="placed_photo")
     db.delete(student)
     db.commit()
     return {"message": "Student record deleted"}
@@ -111,7 +111,7 @@ def delete_placed_student(student_id: int, db: Session = Depends(database.get_db
 @router.get("/companies")
 def get_companies(db: Session = Depends(database.get_db)):
     companies = db.query(models.Company).all()
-    return [{"id": c.id, "name": c.name, "logo_url": c.logo_url} for c in companies]
+    return [{"id": c.id, "name": c.name, "logo_url": c.logo_url, "logo_sizes": images.derivative_urls(c.logo_url)} for c in companies]
 
 
 @router.delete("/companies/{company_id}")
@@ -119,6 +119,7 @@ def delete_company(company_id: int, db: Session = Depends(database.get_db)):
     company = db.query(models.Company).filter(models.Company.id == company_id).first()
     if not company:
         raise HTTPException(404, "Company not found")
+    storage.release_upload(db, company.logo_url, kind="logo")
     db.delete(company)
     db.commit()
     return {"message": "Company removed from marquee"}
\ No newline at end of file
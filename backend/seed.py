@@ -1,9 +1,37 @@
 import json
+import sys
+import argparse
+import logging
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal, engine, Base
 from backend import models
 from datetime import datetime
 
+# 🌟 Scale-test data instead of the demo set:  python -m backend.seed --students 50000 --seed 42
+parser = argparse.ArgumentParser(description="Seed the database (demo data, or a synthetic dataset with --students)")
+parser.add_argument("--students", type=int, help="Generate a synthetic dataset with this many students")
+parser.add_argument("--seed", type=int, default=42, help="Random seed; same seed, same data")
+parser.add_argument("--sections", default="ABCDEF")
+parser.add_argument("--courses-per-semester", type=int, default=6)
+parser.add_argument("--announcements", type=int, default=5000)
+parser.add_argument("--no-history", action="store_true", help="Only current-semester enrollments")
+args, _ = parser.parse_known_args()
+
+if args.students:
+    from backend.synthetic import generate
+    logging.basicConfig(level=logging.INFO)
+    result = generate(
+        engine,
+        students=args.students,
+        sections=args.sections,
+        courses_per_semester=args.courses_per_semester,
+        announcements=args.announcements,
+        history=not args.no_history,
+        seed=args.seed,
+    )
+    print(f"✅ Synthetic dataset ready in {result['seconds']}s: {json.dumps(result['counts'])}")
+    sys.exit(0)
+
 # IMPORTANT: This ensures all models are registered to the Base before creation
 # We use Base.metadata to avoid the "NoReferencedTable" error
 print("Wiping old schema and applying new standardized schema... - seed.py:9")
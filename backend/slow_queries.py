@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import logging
+import datetime
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+
+# --- 1. CONFIG (opt-in) ---
+# SLOW_QUERY_MS=200 logs every statement slower than 200 ms; unset or 0 leaves the engine untouched
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "0") or 0)
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", "logs/slow_queries.log")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# Statements whose plan can be asked for without running them
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+_logger = logging.getLogger("backend.slow_queries")
+
+def _param_shape(parameters, executemany: bool):
+    """Types of the bound parameters, never their values (they can hold passwords)."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": _param_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+def _explain(conn, statement: str, parameters) -> list:
+    """EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (Postgres) on a raw cursor, so no events fire again."""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(col) for col in row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+# --- 2. ENGINE HOOKS ---
+def instrument_engine(engine):
+    if not SLOW_QUERY_MS:
+        return
+
+    os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+    handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("slow_query_started")
+        if not started:
+            return
+        duration_ms = (time.perf_counter() - started.pop()) * 1000
+        if duration_ms < SLOW_QUERY_MS:
+            return
+
+        from .query_stats import current_route
+        plan = None
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            try:
+                plan = _explain(conn, statement, parameters)
+            except Exception as e:
+                plan = [f"EXPLAIN failed: {e}"]
+
+        _logger.info(json.dumps({
+            "at": datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            "duration_ms": round(duration_ms, 1),
+            "route": current_route(),
+            "statement": " ".join(statement.split()),
+            "parameters": _param_shape(parameters, executemany),
+            "plan": plan,
+        }))
+
+# --- 3. READING THE LOG ---
+def recent(limit: int = 50) -> list:
+    """Newest-first entries from the current log file (older ones are in the rotated .1-.5 files)."""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG, "r", encoding="utf-8") as f:
+        lines = deque(f, maxlen=limit)
+    entries = []
+    for line in reversed(lines):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
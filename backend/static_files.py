@@ -0,0 +1,218 @@
+import os
+import re
+import gzip
+import logging
+import mimetypes
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+# Brotli is optional: without it only gzip variants are generated and served
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# --- 1. CACHING POLICY ---
+# Content-addressed blobs (uploaded_files/blobs/ab/cd/<sha256>.ext) never change, so browsers may keep them forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Everything else (legacy timestamped uploads, advisor docs) is cached briefly and revalidated via ETag
+DEFAULT_CACHE = "public, max-age=3600"
+
+CONTENT_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# --- 2. OFFLOAD MODE (front proxy sends the bytes) ---
+# direct     -> Python streams the file (default, no proxy needed)
+# x-accel    -> nginx: X-Accel-Redirect to an `internal` location that aliases the app directory, e.g.
+#                 location /_protected/ { internal; alias /srv/app/; gzip_static on; }
+# x-sendfile -> Apache mod_xsendfile / lighttpd: X-Sendfile with the absolute path
+FILE_SERVING_MODE = os.environ.get("FILE_SERVING_MODE", "direct").strip().lower()
+X_ACCEL_PREFIX = os.environ.get("X_ACCEL_PREFIX", "/_protected").rstrip("/")
+
+def offload_headers(path: str, mode: str = None) -> Optional[dict]:
+    """Header that hands the transfer of `path` (relative to the app directory) to the proxy; None in direct mode."""
+    mode = mode or FILE_SERVING_MODE
+    if mode == "x-accel":
+        rel = os.path.relpath(os.path.abspath(path)).replace("\\", "/")
+        return {"X-Accel-Redirect": quote(f"{X_ACCEL_PREFIX}/{rel}")}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": os.path.abspath(path)}
+    return None
+
+def serve_file(path: str, media_type: str = None, filename: str = None, headers: dict = None,
+               stat_result: os.stat_result = None, status_code: int = 200) -> Response:
+    """
+    Returns the response for a file that has already been authorised and resolved:
+    an empty response with the offload header in proxy mode, otherwise a FileResponse.
+    """
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = dict(headers or {})
+    offload = offload_headers(path)
+    if offload:
+        headers.update(offload)
+        if filename:
+            headers["Content-Disposition"] = f"inline; filename*=utf-8''{quote(filename)}"
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return FileResponse(
+        path,
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+        filename=filename,
+        content_disposition_type="inline",
+        stat_result=stat_result,
+    )
+
+# --- 3. PRECOMPRESSED VARIANTS ---
+# Suffix per Content-Encoding, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "image/svg+xml",
+)
+MIN_COMPRESS_SIZE = 1024
+
+def is_compressible(path: str) -> bool:
+    media_type = mimetypes.guess_type(path)[0] or ""
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+def precompress(path: str):
+    """
+    Writes .gz (and .br when brotli is installed) next to a compressible file.
+    Variants that are not smaller than the original are not kept.
+    """
+    if not is_compressible(path) or os.path.getsize(path) < MIN_COMPRESS_SIZE:
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+
+    for suffix, compressed in variants:
+        if len(compressed) >= len(data):
+            continue
+        tmp_path = f"{path}{suffix}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path + suffix)
+
+# gzip -9 / brotli q11 take long enough on big files to stall an async upload handler
+_precompress_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="precompress")
+
+def _precompress_logged(path: str):
+    try:
+        precompress(path)
+    except Exception as e:
+        logger.warning(f"Could not precompress {path}: {e}")
+
+def schedule_precompress(path: str):
+    """Builds the variants of a newly stored file on a worker thread; it is served uncompressed until then."""
+    if is_compressible(path):
+        _precompress_pool.submit(_precompress_logged, path)
+
+def remove_variants(path: str):
+    for _, suffix in ENCODINGS:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def _accepted_encodings(header: str) -> set:
+    """Parses Accept-Encoding into the set of codings with a non-zero q value."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+# --- 4. STATIC FILES WITH CACHING, RANGES & VARIANTS ---
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with strong ETags, long-lived caching for content-hashed blobs and
+    precompressed .br/.gz variants. Byte ranges are handled by FileResponse
+    (ranged requests always get the identity encoding so offsets stay valid).
+    In x-accel / x-sendfile mode only the headers are built here and the proxy
+    does the transfer (including ranges and its own gzip_static).
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        stem = os.path.splitext(os.path.basename(full_path))[0]
+        content_hashed = bool(CONTENT_HASH_RE.match(stem))
+
+        etag = stem if content_hashed else f"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE if content_hashed else DEFAULT_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        serve_path, serve_stat = full_path, stat_result
+
+        if FILE_SERVING_MODE != "direct":
+            headers["ETag"] = f'"{etag}"'
+            if self.is_not_modified(Headers(headers), request_headers):
+                return NotModifiedResponse(Headers(headers))
+            return serve_file(full_path, media_type=media_type, headers=headers, status_code=status_code)
+
+        if "range" not in request_headers and is_compressible(full_path):
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, suffix in ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    variant_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                serve_path, serve_stat = full_path + suffix, variant_stat
+                headers["Content-Encoding"] = encoding
+                etag = f"{etag}-{encoding}"
+                break
+
+        headers["ETag"] = f'"{etag}"'
+        response = FileResponse(
+            serve_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=serve_stat,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+# --- 5. ONE-OFF BACKFILL ---
+def precompress_tree(directory: str) -> int:
+    """Generates variants for every compressible file already under `directory`."""
+    count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br", ".tmp")):
+                continue
+            path = os.path.join(root, name)
+            if is_compressible(path):
+                precompress(path)
+                count += 1
+    return count
+
+if __name__ == "__main__":
+    # python -m backend.static_files  -> precompress existing uploads
+    logging.basicConfig(level=logging.INFO)
+    for folder in ["uploaded_files", "uploads"]:
+        if os.path.exists(folder):
+            logger.info(f"Precompressed {precompress_tree(folder)} files in {folder}/")
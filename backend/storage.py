@@ -0,0 +1,320 @@
+import os
+import re
+import hashlib
+import logging
+import datetime
+import tempfile
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, images
+from .static_files import schedule_precompress, remove_variants
+
+logger = logging.getLogger(__name__)
+
+# --- 1. UPLOAD LOCATIONS ---
+UPLOAD_DIR = "uploaded_files"
+ADVISOR_DIR = "uploads/advisor_docs"
+
+# Content-addressed blobs live under the /static mount so their URLs resolve like any other upload:
+#   uploaded_files/blobs/ab/cd/abcd1234...<ext>  ->  /static/blobs/ab/cd/abcd1234...<ext>
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+BLOB_TMP_DIR = os.path.join(BLOB_DIR, "tmp")
+STATIC_URL = "http://localhost:8000/static"
+
+# Nothing outside these directories is ever served or deleted on behalf of a stored link
+UPLOAD_ROOTS = [UPLOAD_DIR, "uploads"]
+
+CHUNK_SIZE = 1024 * 1024
+
+# session.info key for files released in the current transaction (deleted only once it commits)
+PENDING_REMOVALS = "storage_pending_removals"
+
+# Filename prefix -> registry kind, used when backfilling files saved before the registry existed
+LEGACY_PREFIX_KINDS = {
+    "bulk_": "bulk_csv",
+    "arrear_": "arrear",
+    "logo_": "logo",
+    "placed_": "placed_photo",
+    "faculty_": "faculty_photo",
+    "student_": "student_photo",
+}
+
+# --- 2. PATH HELPERS ---
+def blob_path(sha256: str, ext: str = "") -> str:
+    """Sharded on-disk location of a blob (two levels of two hex characters)."""
+    return f"{UPLOAD_DIR}/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+def static_url(record: models.UploadedFile) -> str:
+    """Public /static URL of a stored upload."""
+    return f"{STATIC_URL}/{record.path[len(UPLOAD_DIR) + 1:]}"
+
+def static_link(record: models.UploadedFile) -> str:
+    """Host-relative link (static/...) for clients that prefix the API URL themselves."""
+    return f"static/{record.path[len(UPLOAD_DIR) + 1:]}"
+
+def confined_path(path: str) -> Optional[str]:
+    """`path` normalised, or None when it resolves (../, absolute paths, symlinks) outside the upload roots."""
+    real = os.path.realpath(path)
+    for root in UPLOAD_ROOTS:
+        if real.startswith(os.path.realpath(root) + os.sep):
+            return os.path.normpath(path).replace("\\", "/")
+    return None
+
+def is_external(link: Optional[str]) -> bool:
+    """Links to other sites (YouTube videos, Drive folders) rather than to a stored upload."""
+    return bool(link) and link.startswith(("http://", "https://")) and not link.startswith(STATIC_URL + "/")
+
+def resolve_path(link: Optional[str]) -> Optional[str]:
+    """Maps a stored URL or link back to its relative path on disk; None for external or out-of-tree links."""
+    if not link or is_external(link):
+        return None
+    link = link.replace("\\", "/")
+    if link.startswith(STATIC_URL + "/"):
+        path = f"{UPLOAD_DIR}/{link[len(STATIC_URL) + 1:]}"
+    elif link.startswith("static/") or link.startswith("/static/"):
+        path = f"{UPLOAD_DIR}/{link.split('static/', 1)[1]}"
+    else:
+        # Links saved as plain relative paths (older advisor docs: uploads/advisor_docs/...)
+        path = link
+    return confined_path(path)
+
+def registered_path(db: Session, link: Optional[str]) -> Optional[str]:
+    """Disk path of a link only if it is inside the upload roots and known to the uploads registry."""
+    path = resolve_path(link)
+    if not path:
+        return None
+    known = (
+        db.query(models.UploadedFile.id).filter(models.UploadedFile.path == path).first()
+        or db.query(models.Blob.sha256).filter(models.Blob.path == path).first()
+    )
+    return path if known else None
+
+def _extension(name: Optional[str]) -> str:
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+def _unique_filename(db: Session, filename: str) -> str:
+    """Logical names must stay unique because the admin panels delete by them."""
+    candidate, n = filename, 1
+    stem, ext = os.path.splitext(filename)
+    while db.query(models.UploadedFile.id).filter(models.UploadedFile.filename == candidate).first():
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    return candidate
+
+# --- 3. SAVE (DEDUPLICATED) ---
+def save_upload(
+    db: Session,
+    source,
+    filename: str,
+    kind: str,
+    original_name: Optional[str] = None,
+    role: Optional[str] = None,
+    uploaded_by: Optional[str] = None,
+) -> models.UploadedFile:
+    """
+    Stores an upload in the content-addressed blob store and records it in the uploads registry.
+    `source` is either raw bytes or a file-like object (e.g. UploadFile.file).
+    Identical content is stored once; each call adds one reference to the blob.
+    The rows are added to the session; the caller commits.
+    """
+    os.makedirs(BLOB_TMP_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    # Stream to a temp file while hashing, then move it into place (or drop it if the blob exists).
+    # Whatever fails on the way (a read error, the blob row race below), the temp file goes with it.
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=BLOB_TMP_DIR, delete=False) as buffer:
+            tmp_path = buffer.name
+            if isinstance(source, (bytes, bytearray)):
+                buffer.write(source)
+                digest.update(source)
+                size = len(source)
+            else:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    buffer.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        blob = db.query(models.Blob).filter(models.Blob.sha256 == sha256).first()
+        if blob is None:
+            blob = models.Blob(
+                sha256=sha256,
+                path=blob_path(sha256, _extension(original_name or filename)),
+                size_bytes=size,
+                ref_count=1
+            )
+            try:
+                with db.begin_nested():
+                    db.add(blob)
+            except IntegrityError:
+                # The same new content was uploaded concurrently and that row won: count this upload on it
+                blob = db.query(models.Blob).filter(models.Blob.sha256 == sha256).one()
+                blob.ref_count = models.Blob.ref_count + 1
+        else:
+            # Incremented in SQL so concurrent uploads of the same content do not lose a reference
+            blob.ref_count = models.Blob.ref_count + 1
+
+        new_content = not os.path.exists(blob.path)
+        if new_content:
+            os.makedirs(os.path.dirname(blob.path), exist_ok=True)
+            os.replace(tmp_path, blob.path)
+        else:
+            os.remove(tmp_path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if new_content:
+        # New content: .gz/.br variants (so /static never compresses on the fly) and, for photos
+        # and logos, WebP thumbnails are built on worker threads, off the request
+        schedule_precompress(blob.path)
+        images.schedule_derivatives(blob.path, sha256)
+
+    record = models.UploadedFile(
+        path=blob.path,
+        filename=_unique_filename(db, filename),
+        kind=kind,
+        role=role,
+        original_name=original_name or filename,
+        size_bytes=size,
+        sha256=sha256,
+        uploaded_by=uploaded_by,
+    )
+    db.add(record)
+    return record
+
+# --- 4. LOOKUP & RELEASE ---
+def find_upload(db: Session, filename: str, kind: Optional[str] = None) -> Optional[models.UploadedFile]:
+    query = db.query(models.UploadedFile).filter(models.UploadedFile.filename == filename)
+    if kind:
+        query = query.filter(models.UploadedFile.kind == kind)
+    return query.first()
+
+def release_upload(
+    db: Session,
+    link: Optional[str] = None,
+    kind: Optional[str] = None,
+    record: Optional[models.UploadedFile] = None,
+):
+    """
+    Drops one reference to a stored file: `record` itself, or a registry row for `link`
+    (URL, static link or disk path). The file goes from disk when its last reference does,
+    after the transaction commits. Paths the registry does not know, or that lie outside
+    the upload roots, are never touched.
+    """
+    if record is not None:
+        path = record.path
+    else:
+        path = resolve_path(link)
+        if not path:
+            return
+        query = db.query(models.UploadedFile).filter(models.UploadedFile.path == path)
+        if kind:
+            query = query.filter(models.UploadedFile.kind == kind)
+        record = query.order_by(models.UploadedFile.id.desc()).first()
+
+    blob = db.query(models.Blob).filter(models.Blob.path == path).first()
+    if record is None and blob is None:
+        return
+    if record is not None:
+        db.delete(record)
+
+    if blob is not None:
+        blob.ref_count = (blob.ref_count or 1) - 1
+        if blob.ref_count > 0:
+            return
+        db.delete(blob)
+        _remove_after_commit(db, path, blob.sha256)
+    else:
+        # Legacy file from before the blob store: remove it once no other registry row points at it
+        shared = db.query(models.UploadedFile.id).filter(
+            models.UploadedFile.path == path, models.UploadedFile.id != record.id
+        ).first()
+        if not shared:
+            _remove_after_commit(db, path)
+
+def _remove_after_commit(db: Session, path: str, sha256: Optional[str] = None):
+    if confined_path(path):
+        db.info.setdefault(PENDING_REMOVALS, []).append((path, sha256))
+
+@event.listens_for(Session, "after_commit")
+def _remove_released_files(session):
+    for path, sha256 in session.info.pop(PENDING_REMOVALS, []):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            remove_variants(path)
+            if sha256:
+                images.remove_derivatives(sha256)
+        except OSError as e:
+            logger.warning(f"Could not delete physical file {path}: {e}")
+
+@event.listens_for(Session, "after_soft_rollback")
+def _keep_released_files(session, previous_transaction):
+    # A rolled-back release keeps its file; savepoint rollbacks (parent is set) do not count
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_REMOVALS, None)
+
+# --- 5. BACKFILL ---
+def _legacy_files():
+    """(path, kind) of every file saved before the blob store, with `/` separators."""
+    # Flat files in uploaded_files/ (the blobs/ tree below it is the registry's own)
+    if os.path.exists(UPLOAD_DIR):
+        for entry in os.scandir(UPLOAD_DIR):
+            if entry.is_file():
+                kind = next((k for prefix, k in LEGACY_PREFIX_KINDS.items() if entry.name.startswith(prefix)), "material")
+                yield f"{UPLOAD_DIR}/{entry.name}", kind
+    # Advisor docs were saved per class as uploads/advisor_docs/<year>/<section>/<timestamp>_<name>
+    for dirpath, _, names in os.walk(ADVISOR_DIR):
+        for name in names:
+            yield os.path.join(dirpath, name).replace("\\", "/"), "advisor_doc"
+
+def backfill_upload_registry(db: Session):
+    """
+    Registers files that were saved before the uploads table existed.
+    Files already in the registry are skipped, so it is safe to run on every start.
+    """
+    known = {path for (path,) in db.query(models.UploadedFile.path)}
+    added = 0
+    for path, kind in _legacy_files():
+        if path in known:
+            continue
+        name = os.path.basename(path)
+        role = None
+        parts = name.split("_", 3)
+        if kind == "bulk_csv" and len(parts) >= 4:
+            role = parts[2]
+        # Keep the upload time encoded in the legacy name when there is one
+        created_at = None
+        for part in parts[0:3]:
+            if part.isdigit() and len(part) == 10:
+                created_at = datetime.datetime.utcfromtimestamp(int(part))
+                break
+        stat = os.stat(path)
+        db.add(models.UploadedFile(
+            path=path,
+            filename=_unique_filename(db, name),
+            kind=kind,
+            role=role,
+            original_name=name,
+            size_bytes=stat.st_size,
+            created_at=created_at or datetime.datetime.utcfromtimestamp(stat.st_mtime),
+        ))
+        db.flush()
+        added += 1
+
+    db.commit()
+    if added:
+        logger.info(f"Upload registry backfilled with {added} existing files.")
+    return added
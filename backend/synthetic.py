@@ -0,0 +1,260 @@
+"""
+Synthetic dataset generator for scale testing and bug reproductions.
+
+    python -m backend.seed --students 50000 --seed 42
+
+Everything is drawn from one random.Random(seed), so the same arguments always produce the
+same rows. Rows are written with driver-level executemany in chunks, so even millions of
+academic_data rows take seconds rather than the minutes a per-object ORM loop would need.
+"""
+import time
+import random
+import logging
+import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models, ranks
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 20000
+PASSWORD = "pass"
+MATERIAL_TYPES = ["Notes", "Question Bank", "Assignment", "Lab Manual"]
+ANNOUNCEMENT_TYPES = ["Global", "Student", "Subject", "Faculty", "Placement", "Lab"]
+DESIGNATIONS = ["Professor", "Associate Professor", "Assistant Professor"]
+
+def roll_no(i: int) -> str:
+    return f"VH{i:06d}"
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _score(rng: random.Random, low: int, high: int) -> float:
+    # Same idea as randint(low, high) at a fraction of its cost; this runs millions of times
+    return float(low + int(rng.random() * (high - low + 1)))
+
+def _python_defaults(table, names) -> dict:
+    """
+    Column(default=...) values are applied by SQLAlchemy, never by the database, so a driver-level
+    insert has to supply them itself. Scalar defaults for columns the rows leave out are returned
+    here; callable ones (timestamps) must be in the rows, so the output stays reproducible.
+    """
+    defaults = {}
+    for column in table.columns:
+        if column.name in names or column.default is None:
+            continue
+        if not column.default.is_scalar:
+            raise ValueError(f"{table.name}.{column.name} has a Python-side default; set it in the generated rows")
+        defaults[column.name] = column.default.arg
+    return defaults
+
+def _bulk_insert(conn, table, rows, columns=None) -> int:
+    """
+    executemany straight on the driver with positional tuples: skips SQLAlchemy's per-row
+    parameter processing, which dominates at this volume. `rows` are dicts, or tuples in
+    `columns` order for the hot paths. Returns rows written.
+    """
+    total, sql = 0, None
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    for chunk in _chunks(rows):
+        if sql is None:
+            names = columns or list(chunk[0])
+            defaults = _python_defaults(table, names)
+            filler = tuple(defaults.values())
+            sql = (f"INSERT INTO {table.name} ({', '.join(list(names) + list(defaults))}) "
+                   f"VALUES ({', '.join([placeholder] * (len(names) + len(defaults)))})")
+        if columns is None:
+            chunk = [tuple(row[c] for c in names) + filler for row in chunk]
+        elif filler:
+            chunk = [row + filler for row in chunk]
+        conn.exec_driver_sql(sql, chunk)
+        total += len(chunk)
+    return total
+
+MARK_COLUMNS = [
+    "cia1_marks", "cia1_retest", "cia2_marks", "cia2_retest", "ia1_marks", "ia2_marks",
+    "subject_attendance", "cia1_effective", "cia2_effective", "cia_total",
+]
+
+def _marks(rng: random.Random, completed: bool) -> tuple:
+    """One row of marks in MARK_COLUMNS order, with the stored totals filled in."""
+    # Current-semester rows are part way through the term: CIA 2 / IA 2 may not be entered yet
+    cia1 = _score(rng, 10, 60)
+    cia1_retest = _score(rng, 20, 60) if rng.random() < 0.15 else 0.0
+    cia2 = _score(rng, 10, 60) if completed or rng.random() < 0.5 else 0.0
+    ia1 = _score(rng, 5, 20)
+    ia2 = _score(rng, 5, 20) if completed or rng.random() < 0.5 else 0.0
+    attendance = _score(rng, 55, 100)
+    cia1_effective = max(cia1, cia1_retest)
+    return (cia1, cia1_retest, cia2, 0.0, ia1, ia2, attendance,
+            cia1_effective, cia2, cia1_effective + cia2 + ia1 + ia2)
+
+def generate(
+    engine,
+    students: int = 50000,
+    sections: str = "ABCDEF",
+    courses_per_semester: int = 6,
+    faculty: int = 120,
+    materials_per_course: int = 4,
+    announcements: int = 5000,
+    arrear_rate: float = 0.12,
+    history: bool = True,
+    seed: int = 42,
+) -> dict:
+    """
+    Drops and recreates every table, then fills it:
+      - admin, `faculty` staff, one class advisor per year/section
+      - a curriculum of `courses_per_semester` courses for every semester (1-8) and section
+      - `students` spread over years 1-4 and `sections`, enrolled in their current semester;
+        with `history` also their completed earlier semesters (this is what reaches millions of rows)
+      - arrears for `arrear_rate` of students, materials per course and `announcements`
+    Returns row counts plus what benchmarks need to build requests (roll numbers, course sections).
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    sections = list(sections)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    staff = [f"HTS {2000 + i}" for i in range(faculty)]
+    courses = []  # (id, code, title, semester, section)
+    course_id = 0
+    for semester in range(1, 9):
+        for n in range(courses_per_semester):
+            code = f"{semester}AD{n + 1:02d}"
+            title = f"Subject {code}"
+            for section in sections:
+                course_id += 1
+                courses.append((course_id, code, title, semester, section))
+    by_class = {}
+    for c in courses:
+        by_class.setdefault((c[3], c[4]), []).append(c)
+
+    cohort = []
+    for i in range(students):
+        semester = rng.randint(1, 8)
+        cohort.append((roll_no(i), (semester + 1) // 2, semester, rng.choice(sections)))
+
+    def user_rows():
+        yield {"id": "admin", "role": "Admin", "password": "admin123"}
+        for s in staff:
+            yield {"id": s, "role": "Faculty", "password": PASSWORD}
+        for roll, _, _, _ in cohort:
+            yield {"id": roll, "role": "Student", "password": PASSWORD}
+
+    def faculty_rows():
+        yield {"staff_no": "admin", "name": "System Admin", "designation": "Admin", "doj": "01.01.2024"}
+        for i, s in enumerate(staff):
+            yield {"staff_no": s, "name": f"Faculty {i}", "designation": rng.choice(DESIGNATIONS), "doj": "01.06.2022"}
+
+    def course_rows():
+        for cid, code, title, semester, section in courses:
+            yield {"id": cid, "code": code, "title": title, "year": (semester + 1) // 2, "semester": semester,
+                   "credits": rng.choice([3, 4]), "section": section, "faculty_id": rng.choice(staff)}
+
+    def student_rows():
+        for i, (roll, year, semester, section) in enumerate(cohort):
+            yield {"roll_no": roll, "name": f"Student {i}", "year": year, "semester": semester, "section": section,
+                   "cgpa": round(rng.uniform(5.0, 10.0), 2), "attendance_percentage": float(rng.randint(55, 100))}
+
+    academic_columns = ["student_roll_no", "course_id", "course_code", "subject", "section", "status"] + MARK_COLUMNS
+
+    def academic_rows():
+        # Tuples rather than dicts: this is the table that reaches millions of rows
+        for roll, _, semester, section in cohort:
+            first = 1 if history else semester
+            for sem in range(first, semester + 1):
+                completed = sem < semester
+                status = "Completed" if completed else "Pursuing"
+                for cid, code, title, _, _ in by_class[(sem, section)]:
+                    yield (roll, cid, code, title, section, status) + _marks(rng, completed)
+
+    def arrear_rows():
+        for roll, year, semester, section in cohort:
+            if semester == 1 or rng.random() >= arrear_rate:
+                continue
+            past = [c for sem in range(1, semester) for c in by_class[(sem, section)]]
+            for _, code, title, sem, _ in rng.sample(past, min(len(past), rng.randint(1, 3))):
+                yield {"roll_no": roll, "name": roll, "batch": f"Year {year}", "semester": str(sem),
+                       "subject_code": code, "subject_name": title}
+
+    # Fixed timestamps rather than utcnow, so the same seed always produces the same rows.
+    # ISO text: what SQLAlchemy's SQLite DateTime reads back, and valid input for Postgres
+    start = datetime.datetime(2026, 1, 1)
+
+    def material_rows():
+        i = 0
+        for cid, code, title, _, section in courses:
+            for n in range(materials_per_course):
+                yield {"course_id": cid, "course_code": code, "type": rng.choice(MATERIAL_TYPES),
+                       "title": f"{title} - Unit {n + 1}", "posted_by": rng.choice(staff),
+                       "file_link": f"https://example.com/materials/{code}/{section}/{n + 1}.pdf",
+                       "created_at": str(start + datetime.timedelta(minutes=i))}
+                i += 1
+
+    def announcement_rows():
+        for i in range(announcements):
+            kind = rng.choice(ANNOUNCEMENT_TYPES)
+            _, code, _, _, section = rng.choice(courses)
+            yield {"title": f"Notice {i}", "content": f"Details for notice {i}.", "type": kind,
+                   "target_year": rng.randint(1, 4) if kind == "Placement" else None,
+                   "course_code": code if kind in ("Subject", "Lab") else None,
+                   "section": section if rng.random() < 0.6 else "All",
+                   "posted_by": rng.choice(staff),
+                   "created_at": str(start + datetime.timedelta(minutes=i))}
+
+    def advisor_rows():
+        advisors = rng.sample(staff, min(len(staff), 4 * len(sections)))
+        for n, (year, section) in enumerate((y, s) for y in range(1, 5) for s in sections):
+            if n < len(advisors):
+                yield {"advisor_no": f"ADV{n + 1:03d}", "faculty_id": advisors[n], "year": year,
+                       "semester": year * 2, "section": section, "assigned_at": str(start)}
+
+    counts = {}
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # Bulk load only: the data is regenerated from the seed if the process dies
+            conn.execute(text("PRAGMA synchronous = OFF"))
+        for model, rows, columns in [
+            (models.User, user_rows(), None),
+            (models.Faculty, faculty_rows(), None),
+            (models.Course, course_rows(), None),
+            (models.Student, student_rows(), None),
+            (models.AcademicData, academic_rows(), academic_columns),
+            (models.Arrear, arrear_rows(), None),
+            (models.Material, material_rows(), None),
+            (models.Announcement, announcement_rows(), None),
+            (models.ClassAdvisor, advisor_rows(), None),
+        ]:
+            # Loading first and indexing afterwards is much cheaper than maintaining the indexes row by row
+            indexes = list(model.__table__.indexes)
+            for index in indexes:
+                index.drop(conn)
+            counts[model.__tablename__] = _bulk_insert(conn, model.__table__, rows, columns)
+            for index in indexes:
+                index.create(conn)
+
+    with Session(engine) as db:
+        ranks.refresh_ranks(db)
+        db.commit()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Synthetic dataset (seed={seed}) generated in {elapsed:.1f}s: {counts}")
+    return {
+        "seed": seed,
+        "seconds": round(elapsed, 1),
+        "counts": counts,
+        "roll_nos": [c[0] for c in cohort],
+        "course_sections": sorted({(code, section) for _, code, _, _, section in courses}),
+        "password": PASSWORD,
+    }
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+
+# weboops.db and the upload folders are resolved against the working directory when `backend`
+# is first imported (test modules import it at collection), so move to an empty temp directory
+# before that happens: the tests never touch a real database or real uploads.
+_CWD = os.getcwd()
+_WORKDIR = tempfile.mkdtemp(prefix="weboops-tests-")
+os.chdir(_WORKDIR)
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(_CWD)
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def app():
+    from backend.main import app
+    return app
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+@pytest.fixture
+def db(app):
+    from backend.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Counts the SQL statements run inside the block, including those of requests served by TestClient:
+
+        with count_queries() as q:
+            client.get("/student/21AD001/rank")
+        assert q.count == 1
+    """
+    from backend.database import engine
+    from backend.query_stats import count_queries as _count_queries
+    return lambda: _count_queries(engine)
@@ -0,0 +1,80 @@
+import pytest
+from backend import models, ranks
+from backend.cache import section_feed_cache
+
+ROLL_NO = "QC001"
+
+@pytest.fixture(scope="module", autouse=True)
+def student(app):
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    db.add(models.User(id=ROLL_NO, role="Student", password="x"))
+    db.add(models.Student(roll_no=ROLL_NO, name="Query Count", year=2, semester=3, section="A", cgpa=8.5))
+    course = models.Course(code="QC101", title="Counting", year=2, semester=3, credits=3, section="A")
+    db.add(course)
+    db.flush()
+    db.add(models.AcademicData(student_roll_no=ROLL_NO, course_id=course.id, course_code="QC101", subject="Counting", section="A"))
+    db.add(models.Arrear(roll_no=ROLL_NO, subject_code="QC100", subject_name="Old", semester="1"))
+    ranks.refresh_ranks(db)
+    db.commit()
+    db.close()
+
+def test_dashboard_query_count(client, count_queries):
+    # student, enrollments, arrears, then announcements + materials for the section feed
+    section_feed_cache.invalidate()
+    with count_queries() as q:
+        response = client.get(f"/student/{ROLL_NO}/dashboard")
+    assert response.status_code == 200
+    assert q.count == 5
+
+def test_dashboard_feed_is_cached(client, count_queries):
+    client.get(f"/student/{ROLL_NO}/dashboard")
+    with count_queries() as q:
+        client.get(f"/student/{ROLL_NO}/dashboard")
+    assert q.count == 3
+
+def test_rank_lookup_query_count(client, count_queries):
+    # A single student_ranks primary-key lookup: rebuilds happen after writes, never on reads
+    with count_queries() as q:
+        response = client.get(f"/student/{ROLL_NO}/rank")
+    assert response.status_code == 200
+    assert response.json()["overall"]["rank"] == 1
+    assert q.count == 1
+
+def test_rank_rebuilt_after_cgpa_change(client):
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    db.add(models.User(id="QC002", role="Student", password="x"))
+    db.add(models.Student(roll_no="QC002", name="Runner Up", year=2, semester=3, section="A", cgpa=7.0))
+    ranks.mark_stale(db)
+    db.commit()
+    db.close()
+
+    update = {"roll_no": "QC002", "name": "Runner Up", "year": 2, "semester": 3, "section": "A", "cgpa": 9.9}
+    assert client.put("/admin/student/update", json=update).status_code == 200
+    ranks._rebuild_pool.submit(lambda: None).result(timeout=5)  # wait for the queued rebuild
+    assert client.get("/student/QC002/rank").json()["overall"]["rank"] == 1
+    assert client.get(f"/student/{ROLL_NO}/rank").json()["overall"]["rank"] == 2
+
+def test_course_analytics_invalidated_per_class(client, count_queries):
+    from backend.database import SessionLocal
+    db = SessionLocal()
+    other = models.Course(code="QC202", title="Other", year=2, semester=3, credits=3, section="B")
+    db.add(other)
+    db.flush()
+    db.add(models.AcademicData(student_roll_no=ROLL_NO, course_id=other.id, course_code="QC202", subject="Other", section="B"))
+    db.commit()
+    db.close()
+
+    client.get("/analytics/course/QC101/A")
+    client.get("/analytics/course/QC202/B")
+    marks = {"student_roll_no": ROLL_NO, "course_code": "QC101", "cia1_marks": 45, "cia1_retest": 0, "cia2_marks": 0,
+             "cia2_retest": 0, "ia1_marks": 0, "ia2_marks": 0, "subject_attendance": 90}
+    assert client.post("/marks/sync", json=marks).status_code == 200
+
+    # The written class is recomputed; the other one is still served from the cache (version check only)
+    response = client.get("/analytics/course/QC101/A")
+    assert response.json()["components"]["cia1"]["max"] == 45
+    with count_queries() as q:
+        client.get("/analytics/course/QC202/B")
+    assert q.count == 1
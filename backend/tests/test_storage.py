@@ -0,0 +1,65 @@
+import os
+import pytest
+from backend import models, storage
+
+def _legacy_advisor_doc(name: str) -> str:
+    # Where the pre-registry upload_advisor_docs saved files: one folder per year and section
+    folder = os.path.join(storage.ADVISOR_DIR, "1", "A")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(b"timetable")
+    return path.replace("\\", "/")
+
+def test_backfill_registers_nested_advisor_docs(app, db):
+    path = _legacy_advisor_doc("1700000000_timetable.pdf")
+    storage.backfill_upload_registry(db)
+    record = db.query(models.UploadedFile).filter(models.UploadedFile.path == path).one()
+    assert record.kind == "advisor_doc"
+
+    # Running it again registers nothing twice
+    assert storage.backfill_upload_registry(db) == 0
+    assert db.query(models.UploadedFile).filter(models.UploadedFile.path == path).count() == 1
+
+def test_deleting_legacy_advisor_doc_removes_file(app, client, db):
+    path = _legacy_advisor_doc("1700000001_planner.pdf")
+    storage.backfill_upload_registry(db)
+    doc = models.Material(title="Planner - Year 1 (A)", type="Planner", file_link=path,
+                          posted_by="Class Advisor", course_code="Global")
+    db.add(doc)
+    db.commit()
+
+    assert client.delete(f"/advisors/delete-doc/{doc.id}").status_code == 200
+    assert not os.path.exists(path)
+
+def test_unregistered_legacy_material_is_still_served(app, client, db):
+    # Saved after the last backfill ran: the registry has never seen it
+    path = _legacy_advisor_doc("1700000002_exams.pdf")
+    doc = models.Material(title="Exams - Year 1 (A)", type="Exam Timetable", file_link=path,
+                          posted_by="Class Advisor", course_code="Global")
+    db.add(doc)
+    db.commit()
+    assert client.get(f"/materials/{doc.id}/download").status_code == 200
+
+def test_material_outside_upload_roots_is_not_served(app, client, db):
+    doc = models.Material(title="Secrets", type="Notes", file_link="uploads/../weboops.db",
+                          posted_by="x", course_code="X")
+    db.add(doc)
+    db.commit()
+    assert client.get(f"/materials/{doc.id}/download").status_code == 404
+
+def test_failed_upload_leaves_no_temp_file(app, db):
+    class Broken:
+        def __init__(self):
+            self.reads = 0
+
+        def read(self, size):
+            self.reads += 1
+            if self.reads > 1:
+                raise OSError("connection reset")
+            return b"partial"
+
+    with pytest.raises(OSError):
+        storage.save_upload(db, Broken(), "broken.pdf", "material")
+    db.rollback()
+    assert os.listdir(storage.BLOB_TMP_DIR) == []
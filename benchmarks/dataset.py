@@ -0,0 +1,21 @@
+"""
+Deterministic dataset for the load benchmarks, written straight into the app's SQLite file
+(by backend.synthetic) before the server starts.
+"""
+import os
+from sqlalchemy import create_engine
+
+from backend.synthetic import generate
+
+def build_dataset(workdir: str, students: int = 2000, seed: int = 42) -> dict:
+    """Returns what the load generator needs to pick realistic request parameters."""
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'weboops.db')}")
+    try:
+        result = generate(engine, students=students, sections="ABC", announcements=300, seed=seed)
+    finally:
+        engine.dispose()
+    return {
+        "roll_nos": result["roll_nos"],
+        "sections": result["course_sections"],
+        "password": result["password"],
+    }
@@ -0,0 +1,169 @@
+"""
+Load test for the hot API endpoints: p50/p95/p99 latency and req/s per scenario, compared
+against stored baselines (benchmarks/baselines.json, committed).
+
+    python -m benchmarks.load --students 2000 --concurrency 8 --duration 10
+    python -m benchmarks.load --save-baseline          # record this machine's numbers
+    python -m benchmarks.load --tolerance 0.15         # fail (exit 1) on >15% regressions
+
+The server is booted with uvicorn in a throwaway directory on a generated dataset
+(fixed --seed), so runs on the same machine are comparable. The baseline file records the
+settings it was measured with; a run with other settings is reported but not compared.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import http.client
+from urllib.parse import urlparse, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+from .server import run_server
+from .dataset import build_dataset
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# --- SCENARIOS ---
+# Each returns (method, path, body) for one request, drawing parameters from the dataset
+def login(data, rng):
+    body = json.dumps({"username": rng.choice(data["roll_nos"]), "password": data["password"]})
+    return "POST", "/login", body
+
+def marks_cia(data, rng):
+    return "GET", "/marks/cia?" + urlencode({"student_id": rng.choice(data["roll_nos"])}), None
+
+def announcements(data, rng):
+    return "GET", "/announcements?" + urlencode({"student_id": rng.choice(data["roll_nos"])}), None
+
+def marks_section(data, rng):
+    code, section = rng.choice(data["sections"])
+    return "GET", "/marks/section?" + urlencode({"course_code": code, "section": section, "sort": "total", "order": "desc"}), None
+
+SCENARIOS = {
+    "login": login,
+    "marks_cia": marks_cia,
+    "announcements": announcements,
+    "marks_section": marks_section,
+}
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+def drive(base_url: str, scenario, data: dict, concurrency: int, duration: float, seed: int) -> dict:
+    """Runs one scenario from `concurrency` keep-alive connections for `duration` seconds."""
+    host = urlparse(base_url)
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        conn = http.client.HTTPConnection(host.hostname, host.port)
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            method, path, body = scenario(data, rng)
+            headers = {"Content-Type": "application/json"} if body else {}
+            started = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            latencies.append(time.perf_counter() - started)
+            if resp.status >= 400:
+                errors += 1
+        conn.close()
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for r in results for l in r[0])
+    return {
+        "requests": len(latencies),
+        "errors": sum(r[1] for r in results),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+# --- BASELINES ---
+def compare(results: dict, baselines: dict, tolerance: float) -> list:
+    """Scenarios whose throughput dropped or p95 rose by more than `tolerance` against the baseline."""
+    regressions = []
+    for name, r in results.items():
+        base = baselines.get(name)
+        if not base:
+            continue
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {r['rps']} req/s vs baseline {base['rps']}")
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {r['p95_ms']} ms vs baseline {base['p95_ms']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    data = build_dataset(workdir, args.students, args.seed)
+
+    with run_server(workdir=workdir, workers=args.workers) as (base_url, _):
+        results = {}
+        print(f"{'scenario':<15} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name in args.scenarios:
+            if args.warmup:
+                drive(base_url, SCENARIOS[name], data, args.concurrency, args.warmup, args.seed)
+            r = drive(base_url, SCENARIOS[name], data, args.concurrency, args.duration, args.seed)
+            results[name] = r
+            print(f"{name:<15} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+    settings = {
+        "students": args.students, "seed": args.seed, "concurrency": args.concurrency,
+        "duration": args.duration, "workers": args.workers,
+    }
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    same_settings = stored.get("settings") == settings
+    baselines = stored.get("scenarios", {}) if same_settings else {}
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "scenarios": baselines}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    regressions = compare(results, baselines, args.tolerance)
+    if stored and not same_settings:
+        print(f"Baseline was recorded with {stored.get('settings')}; not comparing this run.")
+    elif not baselines:
+        print("No baseline yet; run with --save-baseline to record one.")
+    elif regressions:
+        print("REGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    else:
+        print(f"Within {args.tolerance:.0%} of baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import socket
+import tempfile
+import contextlib
+import subprocess
+
+# Repository root, so `backend.main:app` is importable from any working directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Per-request logging a benchmark should not measure: the N+1 budget warning and the JSON access
+# log would flood the output and skew the timings
+BENCH_ENV = {"QUERY_BUDGET": "0", "ACCESS_LOG": "off"}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port} within {timeout}s")
+
+@contextlib.contextmanager
+def run_server(workdir: str = None, port: int = None, workers: int = 1, env: dict = None):
+    """
+    Boots `uvicorn backend.main:app` in `workdir` (a fresh temp dir by default) and yields
+    (base_url, workdir). The app's SQLite file and upload folders are relative to workdir,
+    so benchmarks never touch the developer's database. BENCH_ENV applies unless `env` overrides it.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_")
+    port = port or free_port()
+    proc_env = {**os.environ, "PYTHONPATH": REPO_ROOT, **BENCH_ENV, **(env or {})}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir,
+        env=proc_env,
+    )
+    try:
+        wait_for_port(port)
+        yield f"http://127.0.0.1:{port}", workdir
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
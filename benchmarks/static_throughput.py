@@ -0,0 +1,81 @@
+"""
+Static file throughput benchmark (MB/s served per uvicorn worker).
+
+    python -m benchmarks.static_throughput --sizes 64 1024 8192 --concurrency 8 --duration 10
+
+Files are written into a throwaway working directory before the server starts, then
+fetched in a loop over keep-alive connections through the /static mount.
+"""
+import os
+import time
+import http.client
+import argparse
+import hashlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .server import run_server
+
+def make_files(workdir: str, sizes_kb):
+    """Creates one content-addressed blob per size plus a compressible CSV; returns URL paths."""
+    paths = {}
+    for size_kb in sizes_kb:
+        data = os.urandom(size_kb * 1024)
+        digest = hashlib.sha256(data).hexdigest()
+        rel = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.pdf"
+        os.makedirs(os.path.join(workdir, "uploaded_files", os.path.dirname(rel)), exist_ok=True)
+        with open(os.path.join(workdir, "uploaded_files", rel), "wb") as f:
+            f.write(data)
+        paths[f"{size_kb} KB pdf"] = f"/static/{rel}"
+
+    csv_path = os.path.join(workdir, "uploaded_files", "bench_marks.csv")
+    with open(csv_path, "w") as f:
+        f.write("roll_no,name,cia1,cia2\n")
+        for i in range(20000):
+            f.write(f"VH{i:05d},Student {i},{i % 50},{(i * 7) % 50}\n")
+    paths["csv (gzip)"] = "/static/bench_marks.csv"
+    return paths
+
+def drive(base_url: str, path: str, concurrency: int, duration: float, headers: dict):
+    """Fetches `path` repeatedly from `concurrency` threads; returns (requests, bytes, seconds)."""
+    host = urlparse(base_url)
+
+    def worker():
+        conn = http.client.HTTPConnection(host.hostname, host.port)
+        count, received = 0, 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            received += len(resp.read())
+            count += 1
+        conn.close()
+        return count, received
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: worker(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return sum(r[0] for r in results), sum(r[1] for r in results), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 1024, 8192], help="File sizes in KB")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per file")
+    args = parser.parse_args()
+
+    with run_server(workers=1) as (base_url, workdir):
+        paths = make_files(workdir, args.sizes)
+        # Build the .gz variant the upload path would normally create
+        from backend.static_files import precompress
+        precompress(os.path.join(workdir, "uploaded_files", "bench_marks.csv"))
+
+        print(f"{'file':<14} {'req/s':>10} {'MB/s':>10}")
+        for label, path in paths.items():
+            headers = {"Accept-Encoding": "gzip" if "gzip" in label else "identity"}
+            count, received, elapsed = drive(base_url, path, args.concurrency, args.duration, headers)
+            print(f"{label:<14} {count / elapsed:>10.1f} {received / elapsed / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()